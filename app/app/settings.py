@@ -42,6 +42,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'core',
     'rest_framework',
     'rest_framework.authtoken',
@@ -95,6 +96,52 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+
+# Cached responses and list ETags hang off a per-user data version kept
+# in the default cache. A write handled by one process must invalidate
+# them everywhere, so they are off unless every process shares the cache.
+PROCESS_LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.dummy.DummyCache',
+    'django.core.cache.backends.filebased.FileBasedCache',
+    'django.core.cache.backends.locmem.LocMemCache',
+)
+SHARED_CACHE = (
+    CACHES['default']['BACKEND'] not in PROCESS_LOCAL_CACHE_BACKENDS
+)
+RECIPE_CACHE_ENABLED = bool(int(os.environ.get(
+    'RECIPE_CACHE_ENABLED',
+    SHARED_CACHE
+)))
+RECIPE_CACHE_TIMEOUT = int(os.environ.get('RECIPE_CACHE_TIMEOUT', 300))
+
+# Authenticated users are also cached in each process. Entries are
+# checked against a per-user version in the default cache, so the same
+# rule applies.
+TOKEN_CACHE_ENABLED = bool(int(os.environ.get(
+    'TOKEN_CACHE_ENABLED',
+    SHARED_CACHE
+)))
+TOKEN_CACHE_TTL = int(os.environ.get('TOKEN_CACHE_TTL', 60))
+TOKEN_CACHE_MAX_SIZE = int(os.environ.get('TOKEN_CACHE_MAX_SIZE', 10000))
+
+ACCESS_TOKEN_LIFETIME = int(os.environ.get('ACCESS_TOKEN_LIFETIME', 300))
+REFRESH_TOKEN_LIFETIME = int(
+    os.environ.get('REFRESH_TOKEN_LIFETIME', 30 * 24 * 60 * 60)
+)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -144,10 +191,53 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'core.User'
 
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 50
+
+# Recipe image variants as name: (max width, max height); the thumbnail
+# is cropped to the exact size.
+RECIPE_IMAGE_VARIANTS = {
+    'thumbnail': (200, 200),
+    'medium': (800, 800),
+    'full': (1600, 1600),
+}
+RECIPE_IMAGE_FORMATS = ['webp', 'jpg']
+RECIPE_IMAGE_JOB_ATTEMPTS = 3
+RECIPE_IMAGE_JOB_TIMEOUT = 600
+
+# Accepted image uploads as content type: Pillow format.
+RECIPE_IMAGE_CONTENT_TYPES = {
+    'image/jpeg': 'JPEG',
+    'image/png': 'PNG',
+    'image/webp': 'WEBP',
+    'image/gif': 'GIF',
+}
+RECIPE_IMAGE_MAX_UPLOAD_SIZE = int(
+    os.environ.get('RECIPE_IMAGE_MAX_UPLOAD_SIZE', 25 * 1024 * 1024)
+)
+RECIPE_IMAGE_UPLOAD_CHUNK_SIZE = 64 * 1024
+RECIPE_IMAGE_MAX_PIXELS = 50_000_000
+
 REST_FRAMEWORK = {
-    'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema'
+    'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.ORJSONRenderer',
+        'core.renderers.MessagePackRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.parsers.ORJSONParser',
+        'core.parsers.MessagePackParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
 SPECTACULAR_SETTINGS = {
-    'COMPONENT_SPLIT_REQUEST': True
+    'COMPONENT_SPLIT_REQUEST': True,
+    'DESCRIPTION': (
+        'Request and response bodies are JSON or MessagePack, chosen with '
+        'the Content-Type and Accept headers (application/msgpack). '
+        'Decimals such as prices are strings in both.'
+    ),
 }
\ No newline at end of file
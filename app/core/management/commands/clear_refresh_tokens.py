@@ -0,0 +1,22 @@
+"""
+Django command to delete expired refresh tokens
+"""
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import RefreshToken
+
+
+class Command(BaseCommand):
+    """Django command to delete expired refresh tokens."""
+    help = 'Delete refresh tokens that have expired.'
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        deleted, _ = RefreshToken.objects.filter(
+            expires__lte=timezone.now()
+        ).delete()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {deleted} expired refresh tokens.'
+        ))
@@ -0,0 +1,26 @@
+"""
+Django command to merge tags and ingredients with duplicate names
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.merge import merge_duplicate_names
+from core.models import Recipe, Tag, Ingredient
+
+
+class Command(BaseCommand):
+    """Django command to merge case-insensitive duplicate names."""
+    help = 'Merge tags and ingredients whose names only differ by case.'
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        with transaction.atomic():
+            tags = merge_duplicate_names(Tag, Recipe.tags.through)
+            ingredients = merge_duplicate_names(
+                Ingredient,
+                Recipe.ingredients.through
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Merged {tags} tags and {ingredients} ingredients.'
+        ))
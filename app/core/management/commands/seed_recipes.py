@@ -0,0 +1,92 @@
+"""
+Django command to seed a user with a large recipe dataset
+"""
+import random
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import Recipe, Tag, Ingredient
+
+WORDS = (
+    'apple basil bean beef bread broccoli butter cabbage carrot cheese '
+    'chicken chili chocolate coconut corn cream curry egg garlic ginger '
+    'honey lamb lemon lentil mango mushroom noodle onion orange pasta '
+    'peanut pepper pork potato pumpkin rice salmon shrimp soup spinach '
+    'steak tofu tomato tuna vanilla yogurt baked fried grilled roasted '
+    'spicy sweet smoky creamy crispy quick'
+).split()
+
+
+class Command(BaseCommand):
+    """Django command to seed recipes for benchmarks."""
+    help = 'Create recipes, tags and ingredients in bulk for a user.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--email', default='bench@example.com')
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--tags', type=int, default=50)
+        parser.add_argument('--ingredients', type=int, default=200)
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def _attrs(self, model, user, count):
+        """Create count named rows of model for user."""
+        name = model._meta.model_name
+        return model.objects.bulk_create(
+            [model(user=user, name=f'{name} {i}') for i in range(count)]
+        )
+
+    def _seed_batch(self, user, size, tags, ingredients, rng):
+        """Create one batch of recipes with random tags and ingredients."""
+        recipes = Recipe.objects.bulk_create([
+            Recipe(
+                user=user,
+                title=' '.join(rng.sample(WORDS, 3)).capitalize(),
+                description=' '.join(
+                    rng.choices(WORDS, k=rng.randint(5, 60))
+                ),
+                time_minutes=rng.randint(1, 240),
+                price=Decimal(rng.randint(100, 99999)) / 100,
+            )
+            for _ in range(size)
+        ])
+        Recipe.tags.through.objects.bulk_create([
+            Recipe.tags.through(recipe_id=recipe.id, tag_id=tag.id)
+            for recipe in recipes
+            for tag in rng.sample(tags, rng.randint(0, min(3, len(tags))))
+        ])
+        Recipe.ingredients.through.objects.bulk_create([
+            Recipe.ingredients.through(
+                recipe_id=recipe.id,
+                ingredient_id=ingredient.id
+            )
+            for recipe in recipes
+            for ingredient in rng.sample(
+                ingredients,
+                rng.randint(0, min(8, len(ingredients)))
+            )
+        ])
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        rng = random.Random(options['seed'])
+        user, _ = get_user_model().objects.get_or_create(
+            email=options['email']
+        )
+        tags = self._attrs(Tag, user, options['tags'])
+        ingredients = self._attrs(Ingredient, user, options['ingredients'])
+
+        remaining = options['recipes']
+        while remaining > 0:
+            size = min(remaining, options['batch_size'])
+            with transaction.atomic():
+                self._seed_batch(user, size, tags, ingredients, rng)
+            remaining -= size
+            self.stdout.write(f'{options["recipes"] - remaining} recipes ...')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {options["recipes"]} recipes for {user.email}.'
+        ))
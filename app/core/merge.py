@@ -0,0 +1,43 @@
+"""
+Merge tags and ingredients whose names only differ by case.
+"""
+from django.db.models import Count, Min
+from django.db.models.functions import Lower
+
+
+def merge_duplicate_names(model, through):
+    """Merge rows of model sharing a user and name, ignoring case.
+
+    M2M rows of the duplicates are repointed to the oldest row of each
+    group and the duplicates are deleted. Returns the number deleted.
+    """
+    column = f'{model._meta.model_name}_id'
+    groups = model.objects.annotate(
+        lname=Lower('name')
+    ).values('user_id', 'lname').annotate(
+        count=Count('id'),
+        keep=Min('id')
+    ).filter(count__gt=1)
+
+    merged = 0
+    for group in groups:
+        duplicates = model.objects.annotate(
+            lname=Lower('name')
+        ).filter(
+            user_id=group['user_id'],
+            lname=group['lname']
+        ).exclude(id=group['keep'])
+        recipe_ids = set(through.objects.filter(
+            **{f'{column}__in': duplicates.values('id')}
+        ).values_list('recipe_id', flat=True))
+        through.objects.bulk_create(
+            [
+                through(recipe_id=recipe_id, **{column: group['keep']})
+                for recipe_id in recipe_ids
+            ],
+            ignore_conflicts=True
+        )
+        _, deleted = duplicates.delete()
+        merged += deleted.get(model._meta.label, 0)
+
+    return merged
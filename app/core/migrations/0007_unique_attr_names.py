@@ -0,0 +1,67 @@
+from django.db import migrations
+from django.db.models import Count, Min
+from django.db.models.functions import Lower
+
+
+def merge_duplicate_names(model, through):
+    """Merge rows of model sharing a user and name, ignoring case.
+
+    M2M rows of the duplicates are repointed to the oldest row of each
+    group and the duplicates are deleted.
+    """
+    column = f'{model._meta.model_name}_id'
+    groups = model.objects.annotate(
+        lname=Lower('name')
+    ).values('user_id', 'lname').annotate(
+        count=Count('id'),
+        keep=Min('id')
+    ).filter(count__gt=1)
+
+    for group in groups:
+        duplicates = model.objects.annotate(
+            lname=Lower('name')
+        ).filter(
+            user_id=group['user_id'],
+            lname=group['lname']
+        ).exclude(id=group['keep'])
+        recipe_ids = set(through.objects.filter(
+            **{f'{column}__in': duplicates.values('id')}
+        ).values_list('recipe_id', flat=True))
+        through.objects.bulk_create(
+            [
+                through(recipe_id=recipe_id, **{column: group['keep']})
+                for recipe_id in recipe_ids
+            ],
+            ignore_conflicts=True
+        )
+        duplicates.delete()
+
+
+def merge_duplicates(apps, schema_editor):
+    Recipe = apps.get_model('core', 'Recipe')
+    merge_duplicate_names(apps.get_model('core', 'Tag'), Recipe.tags.through)
+    merge_duplicate_names(
+        apps.get_model('core', 'Ingredient'),
+        Recipe.ingredients.through
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.RunSQL(
+            'CREATE UNIQUE INDEX tag_user_lower_name_uniq '
+            'ON core_tag (user_id, LOWER(name));',
+            'DROP INDEX tag_user_lower_name_uniq;',
+        ),
+        migrations.RunSQL(
+            'CREATE UNIQUE INDEX ingredient_user_lower_name_uniq '
+            'ON core_ingredient (user_id, LOWER(name));',
+            'DROP INDEX ingredient_user_lower_name_uniq;',
+        ),
+    ]
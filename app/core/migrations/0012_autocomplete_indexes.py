@@ -0,0 +1,69 @@
+from django.db import migrations
+
+TRIGRAM_INDEXES = """
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE EXTENSION IF NOT EXISTS btree_gin;
+CREATE INDEX tag_user_name_trgm_idx
+ON core_tag USING GIN (user_id, name gin_trgm_ops);
+CREATE INDEX ingredient_user_name_trgm_idx
+ON core_ingredient USING GIN (user_id, name gin_trgm_ops);
+"""
+
+
+PREFIX_INDEXES = """
+CREATE INDEX tag_user_lower_name_prefix_idx
+ON core_tag (user_id, LOWER(name) text_pattern_ops);
+CREATE INDEX ingredient_user_lower_name_prefix_idx
+ON core_ingredient (user_id, LOWER(name) text_pattern_ops);
+"""
+
+DROP_PREFIX_INDEXES = """
+DROP INDEX tag_user_lower_name_prefix_idx;
+DROP INDEX ingredient_user_lower_name_prefix_idx;
+"""
+
+
+def postgres_sql(sql):
+    """Return a RunPython function executing sql on PostgreSQL only."""
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor == 'postgresql':
+            schema_editor.execute(sql)
+
+    return run
+
+
+def create_trigram_indexes(apps, schema_editor):
+    """Index names for similarity search where pg_trgm is available."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT count(*) FROM pg_available_extensions "
+            "WHERE name IN ('pg_trgm', 'btree_gin')"
+        )
+        if cursor.fetchone()[0] == 2:
+            schema_editor.execute(TRIGRAM_INDEXES)
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'DROP INDEX IF EXISTS tag_user_name_trgm_idx;'
+            'DROP INDEX IF EXISTS ingredient_user_name_trgm_idx;'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_recipe_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            postgres_sql(PREFIX_INDEXES),
+            postgres_sql(DROP_PREFIX_INDEXES)
+        ),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 3.2.25 on 2026-10-18 03:40
+
+from django.db import migrations, models
+from django.db.models.functions import Length
+
+MAX_LENGTH = 255
+
+
+def shorten_long_names(apps, schema_editor):
+    """Cut longer tag names to the limit, keeping them unique by id."""
+    Tag = apps.get_model('core', 'Tag')
+    long_tags = Tag.objects.annotate(
+        length=Length('name')
+    ).filter(length__gt=MAX_LENGTH)
+    for tag in long_tags:
+        suffix = f' ({tag.id})'
+        tag.name = tag.name[:MAX_LENGTH - len(suffix)] + suffix
+        tag.save(update_fields=['name'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_recipe_image_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(shorten_long_names, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='tag',
+            name='name',
+            field=models.CharField(max_length=MAX_LENGTH),
+        ),
+    ]
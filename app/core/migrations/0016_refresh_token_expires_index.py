@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-18 03:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_tag_name_length'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='refreshtoken',
+            name='expires',
+            field=models.DateTimeField(db_index=True),
+        ),
+    ]
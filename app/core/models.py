@@ -1,8 +1,9 @@
 """
 Database models.
 """
-import uuid
+import hashlib
 import os
+import string
 
 from django.db import models
 from django.contrib.auth.models import (
@@ -11,13 +12,37 @@ from django.contrib.auth.models import (
     PermissionsMixin,
 )
 from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
 
-def recipe_image_file_path(instance, filename):
-    """Generate file path for new recipe image."""
-    ext = os.path.splitext(filename)[1]
-    filename = f'{uuid.uuid4()}{ext}'
+from core.storage import ContentAddressedStorage
+
+def file_digest(file):
+    """Return the SHA-256 hex digest of a file's content."""
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in file.chunks():
+        digest.update(chunk)
+    file.seek(0)
+
+    return digest.hexdigest()
+
+def shard_path(directory, filename):
+    """Fan filename out into ab/cd/ subdirectories of directory."""
+    key = filename[:4].lower()
+    if len(key) < 4 or not set(key) <= set(string.hexdigits):
+        key = hashlib.md5(filename.encode()).hexdigest()
 
-    return os.path.join('uploads', 'recipe', filename)
+    return os.path.join(directory, key[:2], key[2:4], filename)
+
+def content_file_path(digest, filename):
+    """Return the stored path of recipe image content."""
+    ext = os.path.splitext(filename)[1].lower()
+
+    return shard_path(os.path.join('uploads', 'recipe'), f'{digest}{ext}')
+
+def recipe_image_file_path(instance, filename):
+    """Generate a content-addressed file path for a new recipe image."""
+    return content_file_path(file_digest(instance.image), filename)
 
 class UserManager(BaseUserManager):
     """Manager for users."""
@@ -48,13 +73,45 @@ class User(AbstractBaseUser, PermissionsMixin):
     name = models.CharField(max_length=255)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    token_generation = models.PositiveIntegerField(default=0)
 
     objects = UserManager()
 
     USERNAME_FIELD = 'email'
 
+class RefreshToken(models.Model):
+    """Long-lived token exchanged for signed access tokens."""
+    key = models.CharField(max_length=64, unique=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE
+    )
+    generation = models.PositiveIntegerField()
+    created = models.DateTimeField(auto_now_add=True)
+    expires = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.key
+
+class RecipeManager(models.Manager):
+    """Manager leaving the search vector out of loaded recipes."""
+
+    def get_queryset(self):
+        return super().get_queryset().defer('search_vector')
+
 class Recipe(models.Model):
     """Recipe object."""
+    IMAGE_NONE = 'none'
+    IMAGE_PENDING = 'pending'
+    IMAGE_READY = 'ready'
+    IMAGE_FAILED = 'failed'
+    IMAGE_STATUS_CHOICES = [
+        (IMAGE_NONE, 'No image'),
+        (IMAGE_PENDING, 'Processing'),
+        (IMAGE_READY, 'Ready'),
+        (IMAGE_FAILED, 'Failed'),
+    ]
+
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
@@ -66,18 +123,45 @@ class Recipe(models.Model):
     link = models.CharField(max_length=255, blank=True)
     tags = models.ManyToManyField('Tag')
     ingredients = models.ManyToManyField('Ingredient')
-    image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    image = models.ImageField(
+        null=True,
+        upload_to=recipe_image_file_path,
+        storage=ContentAddressedStorage()
+    )
+    image_status = models.CharField(
+        max_length=16,
+        choices=IMAGE_STATUS_CHOICES,
+        default=IMAGE_NONE
+    )
+    image_variants = models.JSONField(default=dict, blank=True)
+    # Maintained by a database trigger from the title and description.
+    search_vector = SearchVectorField(null=True, editable=False)
+    updated = models.DateTimeField(auto_now=True)
+
+    objects = RecipeManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-id'], name='recipe_user_id_idx'),
+            models.Index(fields=['image'], name='recipe_image_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
 class Tag(models.Model):
     """Tag object."""
-    name = models.CharField(max_length=2555)
+    name = models.CharField(max_length=255)
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
     )
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-name'], name='tag_user_name_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -89,6 +173,48 @@ class Ingredient(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
     )
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', '-name'],
+                name='ingredient_user_name_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class ImageJob(models.Model):
+    """Queued processing of an uploaded recipe image."""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    recipe = models.ForeignKey('Recipe', on_delete=models.CASCADE)
+    status = models.CharField(
+        max_length=16,
+        choices=STATUS_CHOICES,
+        default=PENDING
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'id'], name='imagejob_status_idx'),
+        ]
 
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return f'{self.recipe_id} {self.status}'
@@ -0,0 +1,59 @@
+"""
+File storage for content-addressed uploads.
+"""
+import os
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Storage for files named after a hash of their content. Saving bytes
+    that are already stored reuses the existing file.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def _save(self, name, content):
+        """
+        Write content next to its target and link it into place, so the
+        name never refers to a partial file. A file linked by a concurrent
+        save holds the same bytes and is kept.
+        """
+        full_path = self.path(name)
+        if os.path.exists(full_path):
+            return name
+
+        directory = os.path.dirname(full_path)
+        if self.directory_permissions_mode is not None:
+            old_umask = os.umask(0)
+            try:
+                os.makedirs(
+                    directory,
+                    self.directory_permissions_mode,
+                    exist_ok=True
+                )
+            finally:
+                os.umask(old_umask)
+        else:
+            os.makedirs(directory, exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as tmp_file:
+                for chunk in content.chunks():
+                    tmp_file.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(tmp_path, self.file_permissions_mode)
+            try:
+                os.link(tmp_path, full_path)
+            except FileExistsError:
+                pass
+        finally:
+            os.unlink(tmp_path)
+
+        return name
@@ -2,13 +2,20 @@
 Test custom django management commands
 """
 
+from datetime import timedelta
+from io import StringIO
 from unittest.mock import patch
 
 from psycopg2 import OperationalError as Psycopg2Error
 
+from django.contrib.auth import get_user_model
 from django.core.management import call_command
+from django.db import connection
 from django.db.utils import OperationalError
-from django.test import SimpleTestCase
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from core.models import Recipe, RefreshToken, Tag
 
 @patch('core.management.commands.wait_for_db.Command.check')
 class CommandTest(SimpleTestCase):
@@ -31,4 +38,63 @@ class CommandTest(SimpleTestCase):
         call_command('wait_for_db')
         
         self.assertEqual(patched_check.call_count, 6)
-        patched_check.assert_called_with(databases=['default'])
\ No newline at end of file
+        patched_check.assert_called_with(databases=['default'])
+
+class MergeDuplicateAttrsTests(TestCase):
+    """Test merging tags and ingredients with duplicate names."""
+
+    def test_merge_duplicate_tags(self):
+        """Test duplicate tags are merged into the oldest one."""
+        with connection.cursor() as cursor:
+            cursor.execute('DROP INDEX tag_user_lower_name_uniq')
+        user = get_user_model().objects.create_user(
+            'merge@example.com',
+            'simple123'
+        )
+        keep = Tag.objects.create(user=user, name='Vegan')
+        duplicate = Tag.objects.create(user=user, name='vegan')
+        r1 = Recipe.objects.create(
+            user=user, title='r1', time_minutes=1, price='1.00'
+        )
+        r2 = Recipe.objects.create(
+            user=user, title='r2', time_minutes=1, price='1.00'
+        )
+        r1.tags.add(keep, duplicate)
+        r2.tags.add(duplicate)
+        out = StringIO()
+
+        call_command('merge_duplicate_attrs', stdout=out)
+
+        self.assertIn('Merged 1 tags and 0 ingredients.', out.getvalue())
+        self.assertEqual(list(Tag.objects.filter(user=user)), [keep])
+        self.assertEqual(list(r1.tags.all()), [keep])
+        self.assertEqual(list(r2.tags.all()), [keep])
+
+
+class ClearRefreshTokensTests(TestCase):
+    """Test deleting expired refresh tokens."""
+
+    def test_clear_expired_refresh_tokens(self):
+        """Test only expired refresh tokens are deleted."""
+        user = get_user_model().objects.create_user(
+            'refresh@example.com',
+            'simple123'
+        )
+        now = timezone.now()
+        RefreshToken.objects.create(
+            key='expired', user=user, generation=0,
+            expires=now - timedelta(seconds=1)
+        )
+        RefreshToken.objects.create(
+            key='live', user=user, generation=0,
+            expires=now + timedelta(days=1)
+        )
+        out = StringIO()
+
+        call_command('clear_refresh_tokens', stdout=out)
+
+        self.assertIn('Deleted 1 expired refresh tokens.', out.getvalue())
+        self.assertEqual(
+            list(RefreshToken.objects.values_list('key', flat=True)),
+            ['live']
+        )
@@ -1,13 +1,14 @@
 """
     Tests for models
 """
+import hashlib
 from decimal import Decimal
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from core import models
 
-from unittest.mock import patch
-
 def create_user(email='test@example.com', password='simple123'):
     return get_user_model().objects.create_user(email, password)
 
@@ -61,6 +62,24 @@ class ModelTests(TestCase):
 
         self.assertEqual(str(tag), tag.name)
 
+    def test_tag_name_unique_per_user_ignoring_case(self):
+        """Test tag names are unique per user regardless of case."""
+        user = create_user()
+        models.Tag.objects.create(user=user, name='Vegan')
+        other = create_user(email='other@example.com')
+        models.Tag.objects.create(user=other, name='Vegan')
+
+        with self.assertRaises(IntegrityError):
+            models.Tag.objects.create(user=user, name='vegan')
+
+    def test_ingredient_name_unique_per_user_ignoring_case(self):
+        """Test ingredient names are unique per user regardless of case."""
+        user = create_user()
+        models.Ingredient.objects.create(user=user, name='Salt')
+
+        with self.assertRaises(IntegrityError):
+            models.Ingredient.objects.create(user=user, name='SALT')
+
     def test_create_ingredient(self):
         """test creating a ingredient is successful."""
         user = create_user()
@@ -68,11 +87,23 @@ class ModelTests(TestCase):
 
         self.assertEqual(str(ingredient), ingredient.name)
 
-    @patch('core.models.uuid.uuid4')
-    def test_recipe_file_name_uuid(self, mock_uuid):
-        """Test generating image path."""
-        uuid = 'test-uuid'
-        mock_uuid.return_value = uuid
-        file_path = models.recipe_image_file_path(None, 'example.jpg')
+    def test_recipe_file_name_content_hash(self):
+        """Test generating image path from the image content."""
+        recipe = models.Recipe(image=SimpleUploadedFile('a.JPG', b'data'))
+        digest = hashlib.sha256(b'data').hexdigest()
+
+        file_path = models.recipe_image_file_path(recipe, 'example.JPG')
+
+        self.assertEqual(
+            file_path,
+            f'uploads/recipe/{digest[:2]}/{digest[2:4]}/{digest}.jpg'
+        )
+
+    def test_shard_path_of_non_hex_name(self):
+        """Test names without a hex prefix are sharded by their hash."""
+        file_path = models.shard_path('uploads', 'photo.jpg')
 
-        self.assertEqual(file_path, f'uploads/recipe/{uuid}.jpg')
\ No newline at end of file
+        self.assertRegex(
+            file_path,
+            r'^uploads/[0-9a-f]{2}/[0-9a-f]{2}/photo.jpg$'
+        )
\ No newline at end of file
@@ -0,0 +1,211 @@
+"""
+Tests for the API renderers and parsers.
+"""
+import datetime
+import io
+import uuid
+from decimal import Decimal
+
+import msgpack
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils.translation import gettext_lazy
+
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+from core.parsers import MessagePackParser, ORJSONParser
+from core.renderers import MessagePackRenderer, ORJSONRenderer
+
+
+class ORJSONRendererTests(SimpleTestCase):
+    """Test rendering with orjson."""
+
+    def test_matches_json_renderer(self):
+        """Test compact output matches the stdlib JSON renderer."""
+        data = {
+            'id': 1,
+            'price': Decimal('5.50'),
+            'title': 'Crème brûlée\u2028ok',
+            'ratio': 0.1,
+            'tags': [{'id': 2, 'name': 'Dessert'}],
+            'link': None,
+            'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+            'label': gettext_lazy('Recipe'),
+            'created': datetime.datetime(
+                2021, 5, 1, 12, 30, tzinfo=datetime.timezone.utc
+            ),
+            'day': datetime.date(2021, 5, 1),
+            'ids': (i for i in range(3)),
+        }
+        expected = JSONRenderer().render(dict(data, ids=[0, 1, 2]))
+
+        self.assertEqual(ORJSONRenderer().render(data), expected)
+
+    def test_render_none(self):
+        """Test rendering no data returns an empty body."""
+        self.assertEqual(ORJSONRenderer().render(None), b'')
+
+    def test_render_indent(self):
+        """Test an indent in the accepted media type is honoured."""
+        ret = ORJSONRenderer().render(
+            {'a': 1},
+            'application/json; indent=2'
+        )
+
+        self.assertEqual(ret, b'{\n  "a": 1\n}')
+
+
+class ORJSONParserTests(SimpleTestCase):
+    """Test parsing with orjson."""
+
+    def test_parse(self):
+        """Test parsing a JSON body."""
+        stream = io.BytesIO('{"title": "Crème", "tags": [1, 2]}'.encode())
+
+        data = ORJSONParser().parse(stream)
+
+        self.assertEqual(data, {'title': 'Crème', 'tags': [1, 2]})
+
+    def test_parse_error(self):
+        """Test invalid JSON raises a parse error."""
+        with self.assertRaises(ParseError):
+            ORJSONParser().parse(io.BytesIO(b'{"title": '))
+
+
+class MessagePackTests(SimpleTestCase):
+    """Test rendering and parsing MessagePack."""
+
+    def test_render(self):
+        """Test Decimal keeps its precision and dates are strings."""
+        data = {
+            'price': Decimal('12345.6789012345'),
+            'created': datetime.date(2021, 5, 1),
+            'tags': [{'id': 1, 'name': 'Vegan'}],
+        }
+
+        ret = msgpack.unpackb(MessagePackRenderer().render(data))
+
+        self.assertEqual(ret, {
+            'price': '12345.6789012345',
+            'created': '2021-05-01',
+            'tags': [{'id': 1, 'name': 'Vegan'}],
+        })
+
+    def test_parse(self):
+        """Test parsing a MessagePack body."""
+        body = msgpack.packb({'title': 'Crème', 'price': '5.50'})
+
+        data = MessagePackParser().parse(io.BytesIO(body))
+
+        self.assertEqual(data, {'title': 'Crème', 'price': '5.50'})
+
+    def test_parse_error(self):
+        """Test an invalid body raises a parse error."""
+        for body in (b'\xc1', b'\x92\x01'):
+            with self.assertRaises(ParseError):
+                MessagePackParser().parse(io.BytesIO(body))
+
+
+class ApiRendererTests(TestCase):
+    """Test the API uses the orjson renderer and parser by default."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'render@example.com',
+            'simple123'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_json_round_trip(self):
+        """Test creating and listing recipes with JSON bodies."""
+        payload = {
+            'title': 'Soup',
+            'time_minutes': 5,
+            'price': '1.50',
+            'tags': [{'name': 'Vegan'}],
+        }
+        url = reverse('recipe:recipe-list')
+
+        res = self.client.post(url, payload, format='json')
+
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(Tag.objects.get().name, 'Vegan')
+        res = self.client.get(url)
+        self.assertEqual(res['Content-Type'], 'application/json')
+        self.assertEqual(
+            res.content,
+            JSONRenderer().render(res.data)
+        )
+        self.assertEqual(res.json()['results'][0]['price'], '1.50')
+
+    def test_invalid_json_rejected(self):
+        """Test a malformed JSON body returns 400."""
+        res = self.client.generic(
+            'POST',
+            reverse('recipe:recipe-list'),
+            '{"title": ',
+            content_type='application/json'
+        )
+
+        self.assertEqual(res.status_code, 400)
+
+    def test_browsable_api(self):
+        """Test the browsable API is still served to browsers."""
+        Recipe.objects.create(
+            user=self.user,
+            title='Soup',
+            time_minutes=5,
+            price=Decimal('1.50')
+        )
+
+        res = self.client.get(
+            reverse('recipe:recipe-list'),
+            HTTP_ACCEPT='text/html'
+        )
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn('text/html', res['Content-Type'])
+        self.assertIn(b'Soup', res.content)
+
+    def test_msgpack_negotiated(self):
+        """Test recipes round-trip as MessagePack on request."""
+        url = reverse('recipe:recipe-list')
+        payload = {'title': 'Soup', 'time_minutes': 5, 'price': '123.45'}
+
+        res = self.client.post(
+            url,
+            msgpack.packb(payload),
+            content_type='application/msgpack',
+            HTTP_ACCEPT='application/msgpack'
+        )
+
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(res['Content-Type'], 'application/msgpack')
+        self.assertEqual(Recipe.objects.get().price, Decimal('123.45'))
+        res = self.client.get(url, HTTP_ACCEPT='application/msgpack')
+        data = msgpack.unpackb(res.content)
+        self.assertEqual(data, self.client.get(url).json())
+        self.assertEqual(data['results'][0]['price'], '123.45')
+
+    def test_msgpack_user_token(self):
+        """Test the user token endpoint accepts MessagePack."""
+        self.client.force_authenticate(None)
+
+        res = self.client.post(
+            reverse('user:token'),
+            msgpack.packb({
+                'email': 'render@example.com',
+                'password': 'simple123'
+            }),
+            content_type='application/msgpack',
+            HTTP_ACCEPT='application/msgpack'
+        )
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn('token', msgpack.unpackb(res.content))
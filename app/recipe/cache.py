@@ -0,0 +1,90 @@
+"""
+Per-user response cache for the recipe APIs.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import urlencode
+
+LIST_PARAMS = ('tags', 'ingredients')
+
+
+def _version_key(user_id):
+    return f'recipe:version:{user_id}'
+
+
+def get_user_version(user_id):
+    """Return the data version of a user."""
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock so an evicted counter never reuses a version.
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+
+    return version
+
+
+def bump_user_version(user_id):
+    """Invalidate every cached response of a user."""
+    try:
+        cache.incr(_version_key(user_id))
+    except ValueError:
+        get_user_version(user_id)
+
+
+def normalize_params(query_params):
+    """Return the query params as a canonical query string."""
+    items = []
+    for key in sorted(query_params):
+        values = query_params.getlist(key)
+        if key in LIST_PARAMS:
+            ids = {i for value in values for i in value.split(',') if i}
+            values = [','.join(sorted(ids))]
+        items.append((key, values))
+
+    return urlencode(items, doseq=True)
+
+
+def response_cache_key(prefix, request):
+    """Return the cache key of a response for the user and params."""
+    params = normalize_params(request.query_params)
+    digest = hashlib.md5(
+        f'{request.get_host()}?{params}'.encode()
+    ).hexdigest()
+    version = get_user_version(request.user.id)
+
+    return f'recipe:{prefix}:{request.user.id}:{version}:{digest}'
+
+
+def response_etag(prefix, request):
+    """Return a strong ETag for the user's data at the request path."""
+    key = response_cache_key(prefix, request)
+    digest = hashlib.md5(
+        f'{key}:{request.path}:{request.accepted_renderer.format}'.encode()
+    ).hexdigest()
+
+    return f'"{digest}"'
+
+
+def object_etag(prefix, request, updated):
+    """Return a strong ETag for an object from the time it last changed."""
+    params = normalize_params(request.query_params)
+    digest = hashlib.md5(
+        f'{prefix}:{request.user.id}:{request.path}?{params}:'
+        f'{updated.isoformat()}:{request.accepted_renderer.format}'.encode()
+    ).hexdigest()
+
+    return f'"{digest}"'
+
+
+def get_cached_response(key):
+    """Return cached response data or None."""
+    return cache.get(key)
+
+
+def set_cached_response(key, data):
+    """Store response data for the configured timeout."""
+    cache.set(key, data, settings.RECIPE_CACHE_TIMEOUT)
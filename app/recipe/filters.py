@@ -0,0 +1,181 @@
+"""
+Queryset filters for the recipe APIs.
+"""
+import functools
+
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    TrigramSimilarity,
+)
+from django.db import connection
+from django.db.models import (
+    Case,
+    Count,
+    Exists,
+    F,
+    FloatField,
+    IntegerField,
+    OuterRef,
+    Q,
+    Subquery,
+    Value,
+    When,
+)
+from django.db.models.functions import Cast, Coalesce, Lower
+
+from core.models import Recipe
+
+SEARCH_CONFIG = 'english'
+
+
+def _through(field):
+    """Return the M2M through model and target column of a recipe field."""
+    related_model = Recipe._meta.get_field(field).related_model
+    column = f'{related_model._meta.model_name}_id'
+
+    return getattr(Recipe, field).through, column
+
+
+def filter_recipes_by(queryset, field, ids, match_all=False):
+    """Filter recipes linked to any (or all) ids with a semi-join."""
+    through, column = _through(field)
+    if not match_all:
+        links = through.objects.filter(
+            recipe_id=OuterRef('pk'),
+            **{f'{column}__in': ids}
+        )
+        return queryset.filter(Exists(links))
+
+    matched = through.objects.filter(
+        **{f'{column}__in': ids}
+    ).values('recipe_id').annotate(
+        count=Count('*')
+    ).filter(count=len(set(ids))).values('recipe_id')
+    return queryset.filter(id__in=matched)
+
+
+def filter_assigned(queryset, field):
+    """Filter tags or ingredients assigned to at least one recipe."""
+    through, column = _through(field)
+    links = through.objects.filter(**{column: OuterRef('pk')})
+
+    return queryset.filter(Exists(links))
+
+
+def annotate_recipe_count(queryset, field):
+    """
+    Annotate tags or ingredients with recipe_count, counted per item off
+    the (item, recipe) index instead of joining and grouping every link.
+    """
+    through, column = _through(field)
+    count = through.objects.filter(**{column: OuterRef('pk')}).values(
+        column
+    ).annotate(count=Count('*')).values('count')
+
+    return queryset.annotate(recipe_count=Coalesce(Subquery(count), 0))
+
+
+def search_recipes(queryset, terms):
+    """
+    Filter recipes matching search terms, annotated with a float rank.
+    Off PostgreSQL, falls back to unranked matching of every word as a
+    substring of the title or description.
+    """
+    if connection.vendor != 'postgresql':
+        for word in terms.split():
+            queryset = queryset.filter(
+                Q(title__icontains=word) | Q(description__icontains=word)
+            )
+        return queryset.annotate(rank=Value(1.0, output_field=FloatField()))
+
+    query = SearchQuery(terms, config=SEARCH_CONFIG, search_type='websearch')
+    # SearchRank is a real; cast it so cursor positions round-trip exactly.
+    return queryset.filter(search_vector=query).annotate(
+        rank=Cast(SearchRank(F('search_vector'), query), FloatField())
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def trigram_enabled():
+    """Return whether the database has the pg_trgm extension installed."""
+    if connection.vendor != 'postgresql':
+        return False
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        return cursor.fetchone() is not None
+
+
+def autocomplete(queryset, field, term, limit):
+    """
+    Return up to limit tags or ingredients whose name starts with or is
+    similar to term, best matches first and most used first within a
+    match quality.
+    """
+    lowered = term.lower()
+    if 'recipe_count' not in queryset.query.annotations:
+        queryset = annotate_recipe_count(queryset, field)
+    queryset = queryset.annotate(lname=Lower('name'))
+
+    if trigram_enabled():
+        matches = queryset.filter(
+            Q(lname__startswith=lowered) | Q(name__trigram_similar=term)
+        ).annotate(similarity=TrigramSimilarity('name', term))
+    else:
+        # Without pg_trgm, substring matches stand in for similar names.
+        matches = queryset.filter(lname__contains=lowered).annotate(
+            similarity=Value(0.0, output_field=FloatField())
+        )
+
+    return matches.annotate(
+        match=Case(
+            When(lname=lowered, then=Value(2)),
+            When(lname__startswith=lowered, then=Value(1)),
+            default=Value(0),
+            output_field=IntegerField()
+        )
+    ).order_by('-match', '-recipe_count', '-similarity', 'name')[:limit]
+
+
+def facet_counts(user, recipes=None):
+    """
+    Return (kind, id, name, count) rows counting the user's recipes per
+    tag and per ingredient in one query, optionally only over a filtered
+    recipe queryset. Items without recipes are left out.
+    """
+    facets = []
+    for field in ('tags', 'ingredients'):
+        through, column = _through(field)
+        model = Recipe._meta.get_field(field).related_model
+        if recipes is None:
+            # Unfiltered, count each item off the (item, recipe) index.
+            links = through.objects.filter(**{column: OuterRef('pk')})
+            count = links.order_by().values(column).annotate(
+                count=Count('*')
+            ).values('count')
+            facet = model.objects.filter(user=user).filter(
+                Exists(links)
+            ).annotate(
+                kind=Value(field),
+                count=Subquery(count)
+            ).values_list('kind', 'id', 'name', 'count')
+        else:
+            # Filtered, one grouped join over the matching recipes' links.
+            related = model._meta.model_name
+            facet = through.objects.filter(
+                recipe_id__in=recipes.values('id'),
+                **{f'{related}__user': user}
+            ).values(
+                kind=Value(field),
+                item_id=F(column),
+                name=F(f'{related}__name')
+            ).annotate(count=Count('*')).values_list(
+                'kind', 'item_id', 'name', 'count'
+            )
+        facets.append(facet)
+
+    tags, ingredients = facets
+    return tags.union(ingredients, all=True).order_by(
+        'kind', '-count', 'name'
+    )
@@ -0,0 +1,250 @@
+"""
+Background processing of uploaded recipe images.
+
+Uploads are queued as ImageJob rows and picked up by the process_images
+command, which renders fixed-size variants in every configured format.
+"""
+import hashlib
+import logging
+import os
+import warnings
+from datetime import timedelta
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+
+from core.models import ImageJob, Recipe, shard_path
+
+logger = logging.getLogger(__name__)
+
+IMAGE_DIR = os.path.join('uploads', 'recipe')
+VARIANT_DIR = os.path.join(IMAGE_DIR, 'variants')
+
+# Pillow format name and save options for each output extension.
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+class InvalidImage(ValueError):
+    """Raised for uploads that are not acceptable images."""
+
+
+def open_image(image_file):
+    """
+    Open an image reading only its header, rejecting unsupported formats
+    and images whose pixel count could exhaust memory when decoded.
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+        try:
+            image = Image.open(
+                image_file,
+                formats=list(settings.RECIPE_IMAGE_CONTENT_TYPES.values())
+            )
+        except Image.DecompressionBombError:
+            raise InvalidImage('Image dimensions are too large.')
+        except (UnidentifiedImageError, OSError):
+            raise InvalidImage(
+                'Upload a valid image. The file you uploaded was either '
+                'not an image or a corrupted image.'
+            )
+
+    width, height = image.size
+    if width * height > settings.RECIPE_IMAGE_MAX_PIXELS:
+        raise InvalidImage('Image dimensions are too large.')
+
+    return image
+
+
+def variant_formats():
+    """Return the output formats supported by the installed Pillow."""
+    return [
+        ext for ext in settings.RECIPE_IMAGE_FORMATS
+        if ext != 'webp' or features.check('webp')
+    ]
+
+
+def render_variant(image, name):
+    """Return a resized copy of image for the named variant."""
+    width, height = settings.RECIPE_IMAGE_VARIANTS[name]
+    if name == 'thumbnail':
+        return ImageOps.fit(image, (width, height), Image.LANCZOS)
+
+    variant = image.copy()
+    variant.thumbnail((width, height), Image.LANCZOS)
+    return variant
+
+
+def build_variants(recipe):
+    """Render and store every variant of a recipe image."""
+    with recipe.image.open('rb') as image_file:
+        image = open_image(image_file)
+        # Apply the camera orientation; EXIF is not copied to the output.
+        image = ImageOps.exif_transpose(image).convert('RGB')
+
+    stem = os.path.splitext(os.path.basename(recipe.image.name))[0]
+    variants = {}
+    for name in settings.RECIPE_IMAGE_VARIANTS:
+        variant = render_variant(image, name)
+        variants[name] = {}
+        for ext in variant_formats():
+            fmt, options = FORMATS[ext]
+            buffer = BytesIO()
+            variant.save(buffer, fmt, **options)
+            path = default_storage.save(
+                os.path.join(
+                    shard_path(VARIANT_DIR, stem),
+                    f'{name}.{ext}'
+                ),
+                ContentFile(buffer.getvalue())
+            )
+            variants[name][ext] = path
+
+    return variants
+
+
+def delete_variants(variants):
+    """Remove stored variant files."""
+    for formats in variants.values():
+        for path in formats.values():
+            default_storage.delete(path)
+
+
+def lock_image(name):
+    """
+    Hold a lock on a stored image name until the transaction ends, so
+    saving and releasing the same content never interleave.
+    """
+    connection = transaction.get_connection()
+    if connection.vendor != 'postgresql':
+        return
+
+    key = int.from_bytes(
+        hashlib.sha256(name.encode()).digest()[:8],
+        'big',
+        signed=True
+    )
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_xact_lock(%s)', [key])
+
+
+def release_image(name):
+    """Delete a stored image once no recipe references its content."""
+    if not name:
+        return False
+
+    with transaction.atomic():
+        lock_image(name)
+        if Recipe.objects.filter(image=name).exists():
+            return False
+
+        Recipe._meta.get_field('image').storage.delete(name)
+
+    return True
+
+
+def enqueue_image(recipe):
+    """Mark a recipe image as processing and queue a job for it."""
+    Recipe.objects.filter(id=recipe.id).update(
+        image_status=Recipe.IMAGE_PENDING,
+        updated=timezone.now()
+    )
+    recipe.image_status = Recipe.IMAGE_PENDING
+    return ImageJob.objects.create(recipe=recipe)
+
+
+def claim_job():
+    """Lock the oldest pending job for this worker, if any."""
+    with transaction.atomic():
+        job = (
+            ImageJob.objects.select_for_update(skip_locked=True)
+            .filter(status=ImageJob.PENDING)
+            .order_by('id')
+            .first()
+        )
+        if job is None:
+            return None
+
+        job.status = ImageJob.RUNNING
+        job.attempts += 1
+        job.save(update_fields=['status', 'attempts', 'updated'])
+
+    return job
+
+
+def requeue_stale_jobs():
+    """Return jobs left running by a crashed worker to the queue."""
+    cutoff = timezone.now() - timedelta(
+        seconds=settings.RECIPE_IMAGE_JOB_TIMEOUT
+    )
+    return ImageJob.objects.filter(
+        status=ImageJob.RUNNING,
+        updated__lt=cutoff
+    ).update(status=ImageJob.PENDING)
+
+
+def run_job(job):
+    """Process a claimed job and record the outcome."""
+    recipe = Recipe.objects.filter(id=job.recipe_id).first()
+    if recipe is None:
+        return False
+
+    old_variants = recipe.image_variants
+    try:
+        variants = build_variants(recipe) if recipe.image else {}
+    except Exception as exc:
+        logger.exception('Processing image of recipe %s failed', recipe.id)
+        retry = job.attempts < settings.RECIPE_IMAGE_JOB_ATTEMPTS
+        job.status = ImageJob.PENDING if retry else ImageJob.FAILED
+        job.error = str(exc)
+        job.save(update_fields=['status', 'error', 'updated'])
+        if not retry:
+            recipe.image_status = Recipe.IMAGE_FAILED
+            recipe.save(update_fields=['image_status', 'updated'])
+        return False
+
+    with transaction.atomic():
+        current = (
+            Recipe.objects.select_for_update().filter(id=recipe.id).first()
+        )
+        if current is None:
+            delete_variants(variants)
+            return False
+
+        if current.image.name != recipe.image.name:
+            # Replaced while processing; the newer job renders it.
+            delete_variants(variants)
+        else:
+            current.image_variants = variants
+            current.image_status = (
+                Recipe.IMAGE_READY if variants else Recipe.IMAGE_NONE
+            )
+            current.save(
+                update_fields=['image_variants', 'image_status', 'updated']
+            )
+            delete_variants(old_variants)
+
+        job.status = ImageJob.DONE
+        job.save(update_fields=['status', 'updated'])
+
+    return True
+
+
+def process_pending(limit=None):
+    """Run queued jobs until the queue is empty or limit is reached."""
+    processed = 0
+    while limit is None or processed < limit:
+        job = claim_job()
+        if job is None:
+            break
+        run_job(job)
+        processed += 1
+
+    return processed
@@ -0,0 +1,478 @@
+"""
+Django command to benchmark the recipe APIs on a seeded dataset
+"""
+import functools
+import os
+import resource
+import statistics
+import tempfile
+import time
+import tracemalloc
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from PIL import Image
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.core.handlers.wsgi import WSGIHandler
+from django.db.models import Count, Prefetch, Q
+from django.urls import resolve, reverse
+
+from rest_framework.authtoken.models import Token
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from core.models import Ingredient, Recipe, Tag
+from core.parsers import MessagePackParser, ORJSONParser
+from core.renderers import MessagePackRenderer, ORJSONRenderer
+from recipe.cache import bump_user_version
+from recipe.filters import (
+    annotate_recipe_count,
+    facet_counts,
+    filter_assigned,
+    filter_recipes_by,
+    search_recipes,
+)
+from recipe.serializers import RecipeSerializer
+from recipe.values import ValuesRepresentation
+
+
+class Command(BaseCommand):
+    """Django command to run benchmarks against the current database."""
+    help = (
+        'Run benchmark scenarios for a seeded user '
+        '(see the seed_recipes command).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'scenarios',
+            nargs='*',
+            help='Scenarios to run, all of them by default.'
+        )
+        parser.add_argument('--email', default='bench@example.com')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--search', default='spicy mango')
+        parser.add_argument('--count', type=int, default=10000)
+        parser.add_argument(
+            '--base-url',
+            help='Server to load test, e.g. http://localhost:8000.'
+        )
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--uploads', type=int, default=8)
+        parser.add_argument(
+            '--upload-size',
+            type=int,
+            default=20,
+            help='Size of each uploaded file in MB.'
+        )
+
+    def _scenarios(self):
+        return [name[6:] for name in dir(self) if name.startswith('bench_')]
+
+    def _time(self, func, repeat):
+        """Return the best wall time of func in milliseconds."""
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            elapsed = (time.perf_counter() - start) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+
+        return best
+
+    def _explain(self, label, queryset, repeat):
+        """Report the plan and timing of a queryset."""
+        elapsed = self._time(lambda: list(queryset.all()), repeat)
+        self.stdout.write(f'  {label}: {elapsed:.2f} ms')
+        if connection.vendor != 'postgresql':
+            return
+
+        plan = queryset.explain(analyze=True)
+        lines = plan.splitlines()
+        summary = [lines[0]] + [
+            line for line in lines if 'Execution Time' in line
+        ]
+        for line in lines if self.verbosity > 1 else summary:
+            self.stdout.write(f'    {line.strip()}')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        self.verbosity = options['verbosity']
+        try:
+            user = get_user_model().objects.get(email=options['email'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'No user {options["email"]}, seed it first.')
+
+        scenarios = options['scenarios'] or self._scenarios()
+        for name in scenarios:
+            if name not in self._scenarios():
+                raise CommandError(f'Unknown scenario {name}.')
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            getattr(self, f'bench_{name}')(user, options)
+
+    def bench_filters(self, user, options):
+        """Compare JOIN + DISTINCT filtering with EXISTS semi-joins."""
+        tag_ids = list(
+            Recipe.tags.through.objects.filter(tag__user=user)
+            .values('tag_id').annotate(uses=Count('*'))
+            .order_by('-uses').values_list('tag_id', flat=True)[:3]
+        )
+        recipes = Recipe.objects.filter(user=user)
+        page = options['page_size'] + 1
+        repeat = options['repeat']
+        self.stdout.write(f'  filtering by tags {tag_ids}')
+
+        self._explain(
+            'join + distinct',
+            recipes.filter(tags__id__in=tag_ids)
+            .order_by('-id').distinct()[:page],
+            repeat
+        )
+        self._explain(
+            'exists (match any)',
+            filter_recipes_by(recipes, 'tags', tag_ids)
+            .order_by('-id')[:page],
+            repeat
+        )
+        self._explain(
+            'grouped semi-join (match all)',
+            filter_recipes_by(recipes, 'tags', tag_ids, match_all=True)
+            .order_by('-id')[:page],
+            repeat
+        )
+
+        tags = Tag.objects.filter(user=user)
+        self._explain(
+            'assigned_only join + distinct',
+            tags.filter(recipe__isnull=False).order_by('-name').distinct(),
+            repeat
+        )
+        self._explain(
+            'assigned_only exists',
+            filter_assigned(tags, 'tags').order_by('-name'),
+            repeat
+        )
+        self._explain(
+            'recipe_count join + group',
+            tags.annotate(recipe_count=Count('recipe')).order_by('-name'),
+            repeat
+        )
+        self._explain(
+            'recipe_count per-item count (assigned_only)',
+            annotate_recipe_count(tags, 'tags').filter(
+                recipe_count__gt=0
+            ).order_by('-name'),
+            repeat
+        )
+
+    def bench_search(self, user, options):
+        """Compare LIKE scans with the ranked full-text search."""
+        recipes = Recipe.objects.filter(user=user)
+        terms = options['search']
+        page = options['page_size'] + 1
+        repeat = options['repeat']
+        self.stdout.write(
+            f'  searching {recipes.count()} recipes for {terms!r}'
+        )
+
+        like = Q()
+        for term in terms.split():
+            like &= Q(title__icontains=term) | Q(description__icontains=term)
+        self._explain(
+            'like scan',
+            recipes.filter(like).order_by('-id')[:page],
+            repeat
+        )
+        self._explain(
+            'full-text (ranked)',
+            search_recipes(recipes, terms).order_by('-rank', '-id')[:page],
+            repeat
+        )
+
+    def bench_facets(self, user, options):
+        """Compare per-model join counts with the facet counts query."""
+        tag_id = Recipe.tags.through.objects.filter(
+            tag__user=user
+        ).values_list('tag_id', flat=True).first()
+        recipes = Recipe.objects.filter(user=user)
+        repeat = options['repeat']
+        self.stdout.write(f'  counting facets, then filtered by tag {tag_id}')
+
+        for model, field in ((Tag, 'tags'), (Ingredient, 'ingredients')):
+            self._explain(
+                f'{field} join + group',
+                model.objects.filter(user=user, recipe__isnull=False)
+                .annotate(count=Count('recipe')).order_by('-count'),
+                repeat
+            )
+        self._explain('facet counts', facet_counts(user), repeat)
+        self._explain(
+            'facet counts (filtered)',
+            facet_counts(user, filter_recipes_by(recipes, 'tags', [tag_id])),
+            repeat
+        )
+
+    def _get_list(self, user, path, params):
+        """Render a list request in process, bypassing the response cache."""
+        bump_user_version(user.id)
+        request = APIRequestFactory().get(path, params)
+        force_authenticate(request, user=user)
+        view = resolve(path).func
+        view(request).render()
+
+    def bench_list(self, user, options):
+        """
+        Time rendering a recipe list page with full and sparse fields.
+        testserver must be in DJANGO_ALLOWED_HOSTS.
+        """
+        params = {'page_size': options['page_size']}
+        repeat = options['repeat']
+        path = reverse('recipe:recipe-list')
+        variants = (
+            ('full', {}),
+            ('fields=id,title,time_minutes', {
+                'fields': 'id,title,time_minutes'
+            }),
+        )
+        for label, extra in variants:
+            elapsed = self._time(
+                lambda: self._get_list(user, path, dict(params, **extra)),
+                repeat
+            )
+            self.stdout.write(f'  {label}: {elapsed:.2f} ms')
+
+    def bench_serialize(self, user, options):
+        """Compare serializers with the values path over --count recipes."""
+        count = options['count']
+        repeat = options['repeat']
+        recipes = Recipe.objects.filter(user=user).order_by('-id')[:count]
+        prefetched = recipes.prefetch_related(*[
+            Prefetch(field, queryset=model.objects.order_by('id'))
+            for field, model in (('tags', Tag), ('ingredients', Ingredient))
+        ])
+        serializer = RecipeSerializer(many=True)
+        representation = ValuesRepresentation.compile(serializer, Recipe)
+        self.stdout.write(f'  serializing {len(recipes)} recipes')
+
+        def serialize(rows):
+            return RecipeSerializer(rows, many=True).data
+
+        rows = list(prefetched)
+        elapsed = self._time(lambda: serialize(rows), repeat)
+        self.stdout.write(f'  serializers: {elapsed:.2f} ms')
+        elapsed = self._time(lambda: serialize(list(prefetched.all())), repeat)
+        self.stdout.write(f'  serializers + queries: {elapsed:.2f} ms')
+
+        values = recipes.values(*representation.columns)
+        rows = list(values)
+        related = representation.fetch_related(rows)
+        elapsed = self._time(
+            lambda: representation.represent(rows, related),
+            repeat
+        )
+        self.stdout.write(f'  values rows: {elapsed:.2f} ms')
+        elapsed = self._time(
+            lambda: representation.represent(values.all()),
+            repeat
+        )
+        self.stdout.write(f'  values rows + queries: {elapsed:.2f} ms')
+
+    def _peak_allocation(self, func):
+        """Return the peak traced allocation of func in MB."""
+        tracemalloc.start()
+        try:
+            func()
+            return tracemalloc.get_traced_memory()[1] / 1024 / 1024
+        finally:
+            tracemalloc.stop()
+
+    def bench_render(self, user, options):
+        """
+        Compare renderer and parser pairs on a list of --count recipes:
+        render time, body size, peak allocation and parse time.
+        """
+        count = options['count']
+        repeat = options['repeat']
+        representation = ValuesRepresentation.compile(
+            RecipeSerializer(many=True),
+            Recipe
+        )
+        data = {'next': None, 'previous': None, 'results': (
+            representation.represent(
+                Recipe.objects.filter(user=user).order_by('-id')
+                .values(*representation.columns)[:count]
+            )
+        )}
+        self.stdout.write(f'  rendering {len(data["results"])} recipes')
+
+        for renderer, parser in (
+            (JSONRenderer(), JSONParser()),
+            (ORJSONRenderer(), ORJSONParser()),
+            (MessagePackRenderer(), MessagePackParser()),
+        ):
+            render = functools.partial(renderer.render, data)
+            elapsed = self._time(render, repeat)
+            peak = self._peak_allocation(render)
+            body = render()
+            parsed = self._time(
+                lambda: parser.parse(BytesIO(body)),
+                repeat
+            )
+            self.stdout.write(
+                f'  {type(renderer).__name__}: {elapsed:.2f} ms, '
+                f'{len(body) / 1024 / 1024:.1f} MB body, '
+                f'peak allocation {peak:.1f} MB, parsed in {parsed:.2f} ms'
+            )
+
+    def bench_load(self, user, options):
+        """Load test the list endpoints of a running server."""
+        if not options['base_url']:
+            self.stdout.write('  skipped, pass --base-url to run it')
+            return
+
+        token, _ = Token.objects.get_or_create(user=user)
+        headers = {'Authorization': f'Token {token.key}'}
+        paths = (
+            '/api/recipe/recipes/',
+            '/api/recipe/tags/',
+        )
+
+        def fetch(url):
+            start = time.perf_counter()
+            request = urllib.request.Request(url, headers=headers)
+            with urllib.request.urlopen(request) as response:
+                response.read()
+            return (time.perf_counter() - start) * 1000
+
+        for path in paths:
+            url = options['base_url'].rstrip('/') + path
+            with ThreadPoolExecutor(options['concurrency']) as pool:
+                start = time.perf_counter()
+                latencies = sorted(
+                    pool.map(fetch, [url] * options['requests'])
+                )
+                elapsed = time.perf_counter() - start
+
+            p95 = latencies[int(len(latencies) * 0.95) - 1]
+            self.stdout.write(
+                f'  {path}: {len(latencies) / elapsed:.0f} req/s, '
+                f'p50 {statistics.median(latencies):.1f} ms, '
+                f'p95 {p95:.1f} ms'
+            )
+
+    def _write_upload_body(self, path, boundary, size):
+        """Write a multipart body holding a JPEG padded to size bytes."""
+        buffer = BytesIO()
+        Image.new('RGB', (1600, 1200), 'red').save(buffer, format='JPEG')
+        image = buffer.getvalue()
+        chunk = b'\0' * (1024 * 1024)
+        padding = size - len(image)
+
+        with open(path, 'wb') as body:
+            body.write(
+                f'--{boundary}\r\n'
+                'Content-Disposition: form-data; name="image"; '
+                'filename="large.jpg"\r\n'
+                'Content-Type: image/jpeg\r\n\r\n'.encode()
+            )
+            body.write(image)
+            while padding > 0:
+                body.write(chunk[:padding])
+                padding -= len(chunk)
+            body.write(f'\r\n--{boundary}--\r\n'.encode())
+
+    def _upload(self, handler, environ, body_path):
+        """Send a multipart body file through a WSGI handler."""
+        statuses = []
+        with open(body_path, 'rb') as body:
+            environ = dict(
+                environ,
+                CONTENT_LENGTH=str(os.path.getsize(body_path))
+            )
+            environ['wsgi.input'] = body
+            response = handler(
+                environ,
+                lambda status, headers: statuses.append(status)
+            )
+            response.close()
+
+        return statuses[0]
+
+    def bench_upload_memory(self, user, options):
+        """
+        Upload large images in parallel through the WSGI handler and
+        report the peak RSS. The host must be in DJANGO_ALLOWED_HOSTS.
+        """
+        token, _ = Token.objects.get_or_create(user=user)
+        recipes = [
+            Recipe.objects.create(
+                user=user,
+                title='Upload benchmark',
+                time_minutes=1,
+                price=0
+            )
+            for _ in range(options['uploads'])
+        ]
+        hosts = [h for h in settings.ALLOWED_HOSTS if '*' not in h]
+        boundary = 'benchmark-boundary'
+        environ = {
+            'REQUEST_METHOD': 'POST',
+            'SERVER_NAME': 'localhost',
+            'SERVER_PORT': '80',
+            'HTTP_HOST': hosts[0].lstrip('.') if hosts else 'localhost',
+            'HTTP_AUTHORIZATION': f'Token {token.key}',
+            'CONTENT_TYPE': f'multipart/form-data; boundary={boundary}',
+            'wsgi.url_scheme': 'http',
+        }
+        handler = WSGIHandler()
+
+        try:
+            with tempfile.TemporaryDirectory() as tmp:
+                body_path = os.path.join(tmp, 'body')
+                self._write_upload_body(
+                    body_path,
+                    boundary,
+                    options['upload_size'] * 1024 * 1024
+                )
+                requests = [
+                    dict(environ, PATH_INFO=reverse(
+                        'recipe:recipe-upload-image',
+                        args=[recipe.id]
+                    ))
+                    for recipe in recipes
+                ]
+                before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                start = time.perf_counter()
+                with ThreadPoolExecutor(options['uploads']) as pool:
+                    statuses = Counter(pool.map(
+                        lambda request: self._upload(
+                            handler, request, body_path
+                        ),
+                        requests
+                    ))
+                elapsed = time.perf_counter() - start
+                after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        finally:
+            # Deleting the recipe releases its image, which other recipes
+            # may still share.
+            for recipe in recipes:
+                recipe.refresh_from_db()
+                recipe.delete()
+
+        self.stdout.write(
+            f'  {options["uploads"]} x {options["upload_size"]} MB uploads '
+            f'in {elapsed:.2f} s: {dict(statuses)}'
+        )
+        self.stdout.write(
+            f'  peak RSS {before // 1024} MB -> {after // 1024} MB '
+            f'(+{(after - before) // 1024} MB)'
+        )
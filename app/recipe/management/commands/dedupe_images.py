@@ -0,0 +1,107 @@
+"""
+Django command to move recipe images to content-addressed paths
+"""
+import os
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import Recipe, content_file_path, file_digest
+from recipe.images import IMAGE_DIR, VARIANT_DIR, lock_image, release_image
+from recipe.signals import invalidate_user_cache
+
+
+def stored_images(storage, directory=IMAGE_DIR):
+    """
+    Yield the paths of the stored images in directory and its shard
+    subdirectories, skipping variants and files still being written.
+    """
+    directories, files = storage.listdir(directory)
+    for name in files:
+        if not name.startswith('.'):
+            yield os.path.join(directory, name)
+    for name in directories:
+        path = os.path.join(directory, name)
+        if path != VARIANT_DIR:
+            yield from stored_images(storage, path)
+
+
+class Command(BaseCommand):
+    """Django command to deduplicate stored recipe images."""
+    help = (
+        'Rename recipe images after a hash of their content, storing '
+        'identical files once, and delete files no recipe references.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report what would change without touching any file.'
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        dry_run = options['dry_run']
+        storage = Recipe._meta.get_field('image').storage
+        recipes = (
+            Recipe.objects.exclude(image='').exclude(image=None)
+            .only('id', 'user_id', 'image').order_by('id')
+        )
+
+        old_names = set()
+        user_ids = set()
+        moved = 0
+        for recipe in recipes.iterator(chunk_size=options['batch_size']):
+            name = recipe.image.name
+            if not storage.exists(name):
+                self.stderr.write(f'Missing file {name} of recipe {recipe.id}')
+                continue
+
+            with storage.open(name) as image_file:
+                new_name = content_file_path(file_digest(image_file), name)
+                if new_name == name:
+                    continue
+                if not dry_run:
+                    with transaction.atomic():
+                        lock_image(new_name)
+                        storage.save(new_name, image_file)
+                        Recipe.objects.filter(id=recipe.id).update(
+                            image=new_name,
+                            updated=timezone.now()
+                        )
+
+            old_names.add(name)
+            user_ids.add(recipe.user_id)
+            moved += 1
+
+        files = stored_images(storage) if storage.exists(IMAGE_DIR) else []
+        candidates = old_names | set(files)
+        referenced = set(
+            Recipe.objects.filter(image__in=candidates)
+            .values_list('image', flat=True)
+        )
+        if dry_run:
+            referenced -= old_names
+
+        deleted = 0
+        reclaimed = 0
+        for name in sorted(candidates - referenced):
+            if not storage.exists(name):
+                continue
+            size = storage.size(name)
+            if not dry_run and not release_image(name):
+                continue
+            reclaimed += size
+            deleted += 1
+
+        if not dry_run:
+            for user_id in user_ids:
+                invalidate_user_cache(user_id)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Moved {moved} images, deleted {deleted} files, reclaimed '
+            f'{reclaimed / (1024 * 1024):.1f} MB.'
+        ))
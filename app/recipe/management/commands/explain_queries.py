@@ -0,0 +1,101 @@
+"""
+Django command to check the recipe API queries use indexes
+"""
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.http import HttpRequest, QueryDict
+from rest_framework.request import Request
+
+from core.models import Recipe, Tag, Ingredient
+from recipe import views
+
+INDEX_SCAN = re.compile(
+    r'(Index Only Scan|Index Scan|Bitmap Index Scan)'
+    r'(?: Backward)? (?:using|on) (\S+)'
+)
+SEQ_SCAN = re.compile(r'Seq Scan on (\S+)')
+
+
+class Command(BaseCommand):
+    """Django command to EXPLAIN the query of each recipe endpoint."""
+    help = 'Run EXPLAIN on each endpoint query and report index usage.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--email', default='bench@example.com')
+        parser.add_argument('--analyze', action='store_true')
+
+    def _queryset(self, viewset, user, action, params=''):
+        """Return the queryset a viewset builds for a request."""
+        http_request = HttpRequest()
+        http_request.GET = QueryDict(params)
+        request = Request(http_request)
+        request.user = user
+        view = viewset(request=request, action=action, format_kwarg=None)
+
+        return view.get_queryset()
+
+    def _endpoints(self, user):
+        """Yield a label and the main query of each endpoint."""
+        page = views.RecipeViewSet.pagination_class.page_size + 1
+        tag_ids = ','.join(
+            str(pk) for pk in Tag.objects.filter(
+                user=user
+            ).values_list('id', flat=True)[:3]
+        )
+        ingredient_ids = ','.join(
+            str(pk) for pk in Ingredient.objects.filter(
+                user=user
+            ).values_list('id', flat=True)[:3]
+        )
+        recipe = Recipe.objects.filter(user=user).first()
+        recipe_id = recipe.id if recipe else 0
+
+        recipes = views.RecipeViewSet
+        yield 'recipe list', self._queryset(recipes, user, 'list')[:page]
+        yield 'recipe list by tags', self._queryset(
+            recipes, user, 'list', f'tags={tag_ids}'
+        )[:page]
+        yield 'recipe list by ingredients', self._queryset(
+            recipes, user, 'list', f'ingredients={ingredient_ids}'
+        )[:page]
+        yield 'recipe list matching all tags', self._queryset(
+            recipes, user, 'list', f'tags={tag_ids}&match=all'
+        )[:page]
+        yield 'recipe detail', self._queryset(
+            recipes, user, 'retrieve'
+        ).filter(pk=recipe_id)
+
+        for name, viewset in (
+            ('tag', views.TagViewSet),
+            ('ingredient', views.IngredentViewSet),
+        ):
+            yield f'{name} list', self._queryset(viewset, user, 'list')
+            yield f'{name} list assigned_only', self._queryset(
+                viewset, user, 'list', 'assigned_only=1'
+            )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        try:
+            user = get_user_model().objects.get(email=options['email'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'No user {options["email"]}.')
+
+        for label, queryset in self._endpoints(user):
+            plan = queryset.explain(analyze=options['analyze'])
+            indexes = [
+                f'{kind} {index}' for kind, index in INDEX_SCAN.findall(plan)
+            ]
+            seq_scans = SEQ_SCAN.findall(plan)
+            if seq_scans:
+                self.stdout.write(self.style.WARNING(
+                    f'{label}: sequential scan on {", ".join(seq_scans)}'
+                ))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'{label}: index scan'))
+            for index in indexes:
+                self.stdout.write(f'    {index}')
+            if options['verbosity'] > 1:
+                self.stdout.write(plan)
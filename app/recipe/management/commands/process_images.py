@@ -0,0 +1,33 @@
+"""
+Django command to process queued recipe images
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipe.images import process_pending, requeue_stale_jobs
+
+
+class Command(BaseCommand):
+    """Django command to run the image processing worker."""
+    help = 'Render variants of uploaded recipe images.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Drain the queue and exit instead of polling.'
+        )
+        parser.add_argument('--sleep', type=float, default=1.0)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        while True:
+            requeue_stale_jobs()
+            processed = process_pending()
+            if processed:
+                self.stdout.write(f'Processed {processed} images.')
+            if options['once']:
+                break
+            if not processed:
+                time.sleep(options['sleep'])
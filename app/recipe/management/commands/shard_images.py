@@ -0,0 +1,154 @@
+"""
+Django command to relocate recipe images into sharded directories
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import Recipe, shard_path
+from recipe.images import IMAGE_DIR, VARIANT_DIR, release_image
+from recipe.signals import invalidate_user_cache
+
+
+def sharded_image(name):
+    """Return the sharded path of a stored image."""
+    return shard_path(IMAGE_DIR, os.path.basename(name))
+
+
+def sharded_variant(path):
+    """Return the sharded path of a stored variant."""
+    stem = os.path.basename(os.path.dirname(path))
+    return os.path.join(
+        shard_path(VARIANT_DIR, stem),
+        os.path.basename(path)
+    )
+
+
+class Command(BaseCommand):
+    """Django command to move recipe images into ab/cd/ directories."""
+    help = (
+        'Copy recipe images and variants into sharded directories, switch '
+        'the rows over in batches and delete the old files. Safe to stop '
+        'and rerun; pass --start-id to resume after the last reported id.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--start-id', type=int, default=0)
+
+    def _copy(self, storage, name, new_name):
+        """Copy a stored file and return the name it was saved under."""
+        with storage.open(name) as source:
+            return storage.save(new_name, source)
+
+    def _plan(self, recipes):
+        """
+        Copy the files of recipes sharing an image to sharded paths,
+        returning the moves. Each file is copied once.
+        """
+        storage = Recipe._meta.get_field('image').storage
+        name = recipes[0].image.name
+        new_name = sharded_image(name)
+        if new_name != name:
+            if not storage.exists(name):
+                for recipe in recipes:
+                    self.stderr.write(
+                        f'Missing file {name} of recipe {recipe.id}'
+                    )
+                return None
+            new_name = self._copy(storage, name, new_name)
+
+        copies = {}
+        switches = []
+        for recipe in recipes:
+            variants = {}
+            for size, formats in recipe.image_variants.items():
+                variants[size] = {}
+                for ext, path in formats.items():
+                    new_path = sharded_variant(path)
+                    if path in copies:
+                        new_path = copies[path]
+                    elif new_path != path and default_storage.exists(path):
+                        new_path = self._copy(default_storage, path, new_path)
+                        copies[path] = new_path
+                    else:
+                        new_path = path
+                    variants[size][ext] = new_path
+            switches.append((recipe, variants))
+
+        if new_name == name and not copies:
+            return None
+
+        return name, new_name, switches, copies
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        recipes = (
+            Recipe.objects.exclude(image='').exclude(image=None)
+            .only('id', 'user_id', 'image', 'image_variants').order_by('id')
+        )
+        last_id = options['start_id']
+        moved = 0
+
+        with ThreadPoolExecutor(options['workers']) as pool:
+            while True:
+                batch = list(
+                    recipes.filter(id__gt=last_id)[:options['batch_size']]
+                )
+                if not batch:
+                    break
+
+                # Recipes sharing an image are planned by one worker, so
+                # no two workers copy to the same path.
+                groups = {}
+                for recipe in batch:
+                    groups.setdefault(recipe.image.name, []).append(recipe)
+                plans = [
+                    p for p in pool.map(self._plan, groups.values()) if p
+                ]
+                moved += self._switch(plans)
+                last_id = batch[-1].id
+                self.stdout.write(f'Relocated up to recipe id {last_id}.')
+
+        self.stdout.write(self.style.SUCCESS(f'Moved {moved} images.'))
+
+    def _switch(self, plans):
+        """Point the rows at the copies, then delete the unused files."""
+        switched = []
+        with transaction.atomic():
+            for name, new_name, switches, copies in plans:
+                # Skip rows whose image changed since the batch was read.
+                switched.append([
+                    Recipe.objects.filter(id=recipe.id, image=name).update(
+                        image=new_name,
+                        image_variants=variants,
+                        updated=timezone.now()
+                    )
+                    for recipe, variants in switches
+                ])
+
+        for updated, (name, new_name, switches, copies) in zip(
+            switched,
+            plans
+        ):
+            for (recipe, _), done in zip(switches, updated):
+                if done:
+                    invalidate_user_cache(recipe.user_id)
+            release_image(name)
+            release_image(new_name)
+            # Variants shared by switched and skipped rows are kept.
+            if all(updated):
+                unused = copies.keys()
+            elif not any(updated):
+                unused = copies.values()
+            else:
+                unused = []
+            for path in unused:
+                default_storage.delete(path)
+
+        return sum(sum(updated) for updated in switched)
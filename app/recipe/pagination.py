@@ -0,0 +1,19 @@
+"""
+Pagination for the recipe APIs.
+"""
+from rest_framework.pagination import CursorPagination
+
+
+class RecipeCursorPagination(CursorPagination):
+    """Keyset pagination over recipes ordered by newest first."""
+    ordering = '-id'
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+    def get_ordering(self, request, queryset, view):
+        """Order search results by rank, newest first within a rank."""
+        if request.query_params.get('search'):
+            return ('-rank', '-id')
+
+        return super().get_ordering(request, queryset, view)
@@ -1,11 +1,89 @@
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
 from core.models import (
     Recipe,
     Tag,
-    Ingredient
+    Ingredient,
+    content_file_path,
+    file_digest
 )
+from recipe.images import (
+    InvalidImage,
+    lock_image,
+    open_image
+)
+
+def requested_fields(request):
+    """Return the field names of a ?fields= read request, or None."""
+    if request is None or request.method not in SAFE_METHODS:
+        return None
+    fields = request.query_params.get('fields')
+    if not fields:
+        return None
+
+    return {name.strip() for name in fields.split(',') if name.strip()}
+
+class SparseFieldsMixin:
+    """Only build the fields listed in ?fields= on the top serializer."""
+
+    def get_field_names(self, declared_fields, info):
+        names = super().get_field_names(declared_fields, info)
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        requested = requested_fields(self.context.get('request'))
+        if parent is not None or requested is None:
+            return names
+
+        return [name for name in names if name in requested]
+
+def _lower_names(names):
+    """
+    Return a name to key map, lowercased as the database lowercases
+    them for the unique name index. Python and SQL only agree on ASCII.
+    """
+    keys = {name: name.lower() for name in names if name.isascii()}
+    other = [name for name in names if name not in keys]
+    if other:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT ' + ', '.join(['LOWER(%s)'] * len(other)),
+                other
+            )
+            keys.update(zip(other, cursor.fetchone()))
+
+    return keys
+
+def _attrs_by_lower_name(model, user, keys):
+    """Return a lowercased name to object map of existing rows."""
+    queryset = model.objects.annotate(lname=Lower('name')).filter(
+        user=user,
+        lname__in=set(keys)
+    )
+
+    return {obj.lname: obj for obj in queryset}
 
-class TagSerializer(serializers.ModelSerializer):
+def get_or_create_attrs(model, user, names):
+    """Return a name to object map, upserting missing names in bulk."""
+    keys = _lower_names(set(names))
+    objs = _attrs_by_lower_name(model, user, keys.values())
+    missing = {
+        key: name for name, key in keys.items() if key not in objs
+    }
+    if missing:
+        model.objects.bulk_create(
+            [model(user=user, name=name) for name in missing.values()],
+            ignore_conflicts=True
+        )
+        objs.update(_attrs_by_lower_name(model, user, missing))
+
+    return {name: objs[keys[name]] for name in names}
+
+class TagSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """serializer a tag"""
 
     class Meta:
@@ -15,7 +93,7 @@ class TagSerializer(serializers.ModelSerializer):
         ]
         read_on_fields = ['id']
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """serializer a ingredient"""
 
     class Meta:
@@ -25,7 +103,138 @@ class IngredientSerializer(serializers.ModelSerializer):
         ]
         read_on_fields = ['id']
 
-class RecipeSerializer(serializers.ModelSerializer):
+class TagCountSerializer(TagSerializer):
+    """serializer a tag with the number of recipes using it"""
+    recipe_count = serializers.IntegerField(read_only=True)
+
+    class Meta(TagSerializer.Meta):
+        fields = TagSerializer.Meta.fields + ['recipe_count']
+
+class IngredientCountSerializer(IngredientSerializer):
+    """serializer a ingredient with the number of recipes using it"""
+    recipe_count = serializers.IntegerField(read_only=True)
+
+    class Meta(IngredientSerializer.Meta):
+        fields = IngredientSerializer.Meta.fields + ['recipe_count']
+
+class FacetSerializer(serializers.Serializer):
+    """Serialize the recipe count of a tag or ingredient."""
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    count = serializers.IntegerField()
+
+class RecipeFacetsSerializer(serializers.Serializer):
+    """Serialize the recipe counts per tag and per ingredient."""
+    tags = FacetSerializer(many=True)
+    ingredients = FacetSerializer(many=True)
+
+class RecipeListSerializer(serializers.ListSerializer):
+    """Serialize many recipes, writing them with batched queries."""
+
+    def _link_attrs(self, field, model, recipes, items):
+        """Bulk insert the M2M rows linking recipes to their attrs."""
+        auth_user = self.context['request'].user
+        names = [item['name'] for attrs in items for item in attrs]
+        objs = get_or_create_attrs(model, auth_user, names)
+
+        through = getattr(Recipe, field).through
+        attr_field = f'{model._meta.model_name}_id'
+        rows = []
+        for recipe, attrs in zip(recipes, items):
+            attr_ids = dict.fromkeys(objs[item['name']].id for item in attrs)
+            rows.extend(
+                through(recipe_id=recipe.id, **{attr_field: attr_id})
+                for attr_id in attr_ids
+            )
+        through.objects.bulk_create(rows)
+
+    def _relink_attrs(self, field, model, recipes, items):
+        """Replace the M2M rows of recipes whose attrs were given."""
+        pairs = [
+            (recipe, attrs) for recipe, attrs in zip(recipes, items)
+            if attrs is not None
+        ]
+        if not pairs:
+            return
+
+        auth_user = self.context['request'].user
+        names = [item['name'] for _, attrs in pairs for item in attrs]
+        objs = get_or_create_attrs(model, auth_user, names)
+
+        through = getattr(Recipe, field).through
+        attr_field = f'{model._meta.model_name}_id'
+        wanted = {
+            (recipe.id, objs[item['name']].id)
+            for recipe, attrs in pairs for item in attrs
+        }
+        current = {
+            (recipe_id, attr_id): row_id
+            for row_id, recipe_id, attr_id in through.objects.filter(
+                recipe_id__in=[recipe.id for recipe, _ in pairs]
+            ).values_list('id', 'recipe_id', attr_field)
+        }
+        stale = [
+            row_id for link, row_id in current.items() if link not in wanted
+        ]
+        if stale:
+            through.objects.filter(id__in=stale).delete()
+        through.objects.bulk_create([
+            through(recipe_id=recipe_id, **{attr_field: attr_id})
+            for recipe_id, attr_id in wanted - current.keys()
+        ])
+
+    @transaction.atomic
+    def create(self, validated_data):
+        """Create recipes."""
+        tags = [item.pop('tags', []) for item in validated_data]
+        ingredients = [item.pop('ingredients', []) for item in validated_data]
+
+        recipes = Recipe.objects.bulk_create(
+            [Recipe(**item) for item in validated_data]
+        )
+        self._link_attrs('tags', Tag, recipes, tags)
+        self._link_attrs('ingredients', Ingredient, recipes, ingredients)
+
+        return recipes
+
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        """Update recipes with one batched write per table."""
+        tags = [item.pop('tags', None) for item in validated_data]
+        ingredients = [
+            item.pop('ingredients', None) for item in validated_data
+        ]
+
+        now = timezone.now()
+        fields = {'updated'}
+        for recipe, attrs in zip(instance, validated_data):
+            for attr, value in attrs.items():
+                setattr(recipe, attr, value)
+                fields.add(attr)
+            recipe.updated = now
+        Recipe.objects.bulk_update(instance, sorted(fields))
+        self._relink_attrs('tags', Tag, instance, tags)
+        self._relink_attrs('ingredients', Ingredient, instance, ingredients)
+
+        return instance
+
+class ImageVariantsField(serializers.ReadOnlyField):
+    """URLs of the processed image variants by size and format."""
+
+    def to_representation(self, value):
+        request = self.context.get('request')
+        urls = {}
+        for name, formats in value.items():
+            urls[name] = {}
+            for ext, path in formats.items():
+                url = default_storage.url(path)
+                if request is not None:
+                    url = request.build_absolute_uri(url)
+                urls[name][ext] = url
+
+        return urls
+
+class RecipeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serialize a recipe"""
     tags = TagSerializer(many=True, required=False)
     ingredients = IngredientSerializer(many=True, required=False)
@@ -36,27 +245,27 @@ class RecipeSerializer(serializers.ModelSerializer):
             'id', 'title', 'time_minutes', 'price', 'link', 'tags', 'ingredients'
         ]
         read_only_fields = ('id',)
+        list_serializer_class = RecipeListSerializer
+
+    def _get_or_create_attrs(self, model, items):
+        """Return objects for items, creating the missing ones in bulk."""
+        auth_user = self.context['request'].user
+        names = list(dict.fromkeys(item['name'] for item in items))
+        objs = get_or_create_attrs(model, auth_user, names)
+
+        return [objs[name] for name in names]
 
     def _get_or_create_tags(self, tags, recipe):
         """Handle getting or creating tags as needed"""
-        auth_user = self.context['request'].user
-        for tag in tags:
-            tag_obj, created = Tag.objects.get_or_create(
-                user=auth_user,
-                **tag
-            )
-            recipe.tags.add(tag_obj)
+        recipe.tags.add(*self._get_or_create_attrs(Tag, tags))
 
     def _get_or_create_ingredient(self, ingredients, recipe):
         """Handle getting or creating ingredient as needed"""
-        auth_user = self.context.get('request').user
-        for ingredient in ingredients:
-            ingredient_obj, created = Ingredient.objects.get_or_create(
-                user = auth_user,
-                **ingredient
-            )
-            recipe.ingredients.add(ingredient_obj)
+        recipe.ingredients.add(
+            *self._get_or_create_attrs(Ingredient, ingredients)
+        )
 
+    @transaction.atomic
     def create(self, validate_data):
         """Create recipe."""
         tags = validate_data.pop('tags', [])
@@ -68,17 +277,18 @@ class RecipeSerializer(serializers.ModelSerializer):
 
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         """Update recipe."""
         tags = validated_data.pop('tags', None)
         ingredients = validated_data.pop('ingredients', None)
         if tags is not None:
-            instance.tags.clear()
-            self._get_or_create_tags(tags, instance)
+            instance.tags.set(self._get_or_create_attrs(Tag, tags))
 
         if ingredients is not None:
-            instance.ingredients.clear()
-            self._get_or_create_ingredient(ingredients, instance)
+            instance.ingredients.set(
+                self._get_or_create_attrs(Ingredient, ingredients)
+            )
 
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
@@ -88,15 +298,46 @@ class RecipeSerializer(serializers.ModelSerializer):
 
 class RecipeDetailSerializer(RecipeSerializer):
     """Serializer for recipe detial view"""
+    image_variants = ImageVariantsField()
 
     class Meta(RecipeSerializer.Meta):
-        fields = RecipeSerializer.Meta.fields + ['description']
+        fields = RecipeSerializer.Meta.fields + [
+            'description', 'image', 'image_status', 'image_variants'
+        ]
+        read_only_fields = ('id', 'image', 'image_status')
+
+class ImageHeaderField(serializers.ImageField):
+    """Image field validating the header instead of decoding the image."""
+
+    def to_internal_value(self, data):
+        file_object = super(serializers.ImageField, self).to_internal_value(
+            data
+        )
+        try:
+            open_image(file_object)
+        except InvalidImage as exc:
+            raise serializers.ValidationError(str(exc))
+        finally:
+            file_object.seek(0)
 
-class RecipeImageSerializer(serializers.ModelSerializer):
+        return file_object
+
+class RecipeImageSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for uploading image to recipes."""
+    image = ImageHeaderField()
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
-        fields = ['id', 'image']
-        read_only_fields = ['id']
-        extra_kwargs = {'image': {'required': True}}
\ No newline at end of file
+        fields = ['id', 'image', 'image_status', 'image_variants']
+        read_only_fields = ['id', 'image_status']
+
+    def update(self, instance, validated_data):
+        """Replace the image; saving releases the previous file."""
+        image = validated_data.get('image')
+        with transaction.atomic():
+            # Keep a concurrent release of the same content from deleting
+            # the file before this row references it.
+            if image is not None:
+                lock_image(content_file_path(file_digest(image), image.name))
+            return super().update(instance, validated_data)
\ No newline at end of file
@@ -0,0 +1,107 @@
+"""
+Signal handlers invalidating cached recipe responses, marking recipes
+changed and releasing recipe images.
+"""
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_init,
+    post_save,
+    pre_delete
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.models import Recipe, Tag, Ingredient
+from recipe.cache import bump_user_version
+from recipe.images import delete_variants, release_image
+
+
+def invalidate_user_cache(user_id):
+    """Bump the user version now and again once the write commits."""
+    bump_user_version(user_id)
+    transaction.on_commit(lambda: bump_user_version(user_id))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_on_write(sender, instance, **kwargs):
+    invalidate_user_cache(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def invalidate_on_m2m_change(sender, instance, action, **kwargs):
+    if action.startswith('post_'):
+        invalidate_user_cache(instance.user_id)
+
+
+def touch_recipes(**filters):
+    """Mark recipes changed, so their object ETags change."""
+    Recipe.objects.filter(**filters).update(updated=timezone.now())
+
+
+def touch_linked_recipes(item):
+    """Mark the recipes using a tag or ingredient changed."""
+    through = getattr(Recipe, f'{item._meta.model_name}s').through
+    touch_recipes(pk__in=through.objects.filter(
+        **{item._meta.model_name: item}
+    ).values('recipe_id'))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def touch_on_rename(sender, instance, created, **kwargs):
+    if not created:
+        touch_linked_recipes(instance)
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def touch_on_item_delete(sender, instance, **kwargs):
+    touch_linked_recipes(instance)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def touch_on_m2m_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action.startswith('post_'):
+            touch_recipes(pk=instance.pk)
+    elif action in ('post_add', 'post_remove'):
+        touch_recipes(pk__in=pk_set)
+    elif action == 'pre_clear':
+        touch_linked_recipes(instance)
+
+
+@receiver(post_init, sender=Recipe)
+def remember_image(sender, instance, **kwargs):
+    """Remember the stored image name, unless the field is deferred."""
+    image = instance.__dict__.get('image')
+    instance._stored_image = getattr(image, 'name', image)
+
+
+@receiver(post_save, sender=Recipe)
+def release_replaced_image(sender, instance, **kwargs):
+    """Release the previous image once a save replacing it commits."""
+    old_name = instance._stored_image
+    instance._stored_image = instance.image.name
+    if old_name and old_name != instance.image.name:
+        transaction.on_commit(lambda: release_image(old_name))
+
+
+@receiver(post_delete, sender=Recipe)
+def release_files_on_delete(sender, instance, **kwargs):
+    name = instance.image.name
+    variants = instance.image_variants
+
+    def release():
+        release_image(name)
+        delete_variants(variants)
+
+    transaction.on_commit(release)
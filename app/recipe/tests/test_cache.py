@@ -0,0 +1,339 @@
+"""
+Tests for the recipe response cache.
+"""
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+from recipe.images import enqueue_image
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+FACETS_URL = reverse('recipe:recipe-facets')
+
+
+def sample_recipe(user, **params):
+    defaults = {
+        'title': 'simple recipe',
+        'time_minutes': 10,
+        'price': 5.00
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+@override_settings(RECIPE_CACHE_ENABLED=True)
+class ResponseCacheTests(TestCase):
+    """Test caching of list responses."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'cache@example.com',
+            'simple123'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_list_served_from_cache(self):
+        """Test a repeated list request runs no queries."""
+        sample_recipe(user=self.user)
+        res1 = self.client.get(RECIPE_URL)
+
+        with self.assertNumQueries(0):
+            res2 = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res2.status_code, status.HTTP_200_OK)
+        self.assertEqual(res1.data, res2.data)
+
+    def test_create_invalidates_cache(self):
+        """Test creating a recipe invalidates the cached list."""
+        self.client.get(RECIPE_URL)
+        payload = {'title': 'Soup', 'time_minutes': 5, 'price': '1.00'}
+        self.client.post(RECIPE_URL, payload)
+
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_update_and_delete_invalidate_cache(self):
+        """Test updating and deleting recipes invalidates the cache."""
+        recipe = sample_recipe(user=self.user)
+        self.client.get(RECIPE_URL)
+        url = reverse('recipe:recipe-detail', args=[recipe.id])
+
+        self.client.patch(url, {'title': 'New title'})
+        res = self.client.get(RECIPE_URL)
+        self.assertEqual(res.data['results'][0]['title'], 'New title')
+
+        self.client.delete(url)
+        res = self.client.get(RECIPE_URL)
+        self.assertEqual(res.data['results'], [])
+
+    def test_m2m_change_invalidates_tag_list(self):
+        """Test assigning a tag invalidates the assigned_only list."""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        recipe = sample_recipe(user=self.user)
+        res = self.client.get(TAGS_URL, {'assigned_only': 1})
+        self.assertEqual(res.data, [])
+
+        recipe.tags.add(tag)
+        res = self.client.get(TAGS_URL, {'assigned_only': 1})
+
+        self.assertEqual(res.data[0]['name'], 'Vegan')
+
+    def test_facets_cached_and_invalidated(self):
+        """Test facet counts are cached until a recipe changes."""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        recipe = sample_recipe(user=self.user)
+        recipe.tags.add(tag)
+        res1 = self.client.get(FACETS_URL)
+
+        with self.assertNumQueries(0):
+            res2 = self.client.get(FACETS_URL)
+        self.assertEqual(res1.data, res2.data)
+
+        sample_recipe(user=self.user).tags.add(tag)
+        res = self.client.get(FACETS_URL)
+
+        self.assertEqual(res.data['tags'][0]['count'], 2)
+
+    def test_params_normalized(self):
+        """Test the order of filter IDs shares a cache entry."""
+        t1 = Tag.objects.create(user=self.user, name='Vegan')
+        t2 = Tag.objects.create(user=self.user, name='Dinner')
+        self.client.get(RECIPE_URL, {'tags': f'{t1.id},{t2.id}'})
+
+        with self.assertNumQueries(0):
+            self.client.get(RECIPE_URL, {'tags': f'{t2.id},{t1.id}'})
+
+    def test_cache_per_user(self):
+        """Test cached responses are not shared between users."""
+        sample_recipe(user=self.user)
+        self.client.get(RECIPE_URL)
+        user2 = get_user_model().objects.create_user(
+            'other@example.com',
+            'simple123'
+        )
+        self.client.force_authenticate(user2)
+
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.data['results'], [])
+
+    def test_bulk_create_invalidates_cache(self):
+        """Test the bulk endpoint invalidates the cached list."""
+        self.client.get(RECIPE_URL)
+        payload = [{'title': 'Soup', 'time_minutes': 5, 'price': '1.00'}]
+        self.client.post(
+            reverse('recipe:recipe-bulk'),
+            payload,
+            format='json'
+        )
+
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(len(res.data['results']), 1)
+
+
+@override_settings(RECIPE_CACHE_ENABLED=True)
+class ConditionalRequestTests(TestCase):
+    """Test ETag and conditional request handling."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'etag@example.com',
+            'simple123'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = sample_recipe(user=self.user)
+        self.url = reverse('recipe:recipe-detail', args=[self.recipe.id])
+
+    def test_list_not_modified(self):
+        """Test a matching If-None-Match returns 304 without queries."""
+        etag = self.client.get(RECIPE_URL)['ETag']
+
+        with self.assertNumQueries(0):
+            res = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res['ETag'], etag)
+
+    def test_facets_not_modified(self):
+        """Test facet counts answer conditional requests."""
+        etag = self.client.get(FACETS_URL)['ETag']
+
+        self.assertNotEqual(etag, self.client.get(RECIPE_URL)['ETag'])
+        with self.assertNumQueries(0):
+            res = self.client.get(FACETS_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_detail_not_modified(self):
+        """Test a current If-None-Match on a detail returns 304."""
+        etag = self.client.get(self.url)['ETag']
+
+        with self.assertNumQueries(1):
+            res = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_detail_etag_changes_on_recipe_write(self):
+        """Test the detail ETag changes with the recipe and its tags."""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        etag = self.client.get(self.url)['ETag']
+
+        self.recipe.tags.add(tag)
+        res = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+
+        etag = res['ETag']
+        tag.name = 'Vegetarian'
+        tag.save()
+        res = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['tags'][0]['name'], 'Vegetarian')
+
+    def test_detail_etag_changes_on_image_status(self):
+        """Test the detail ETag changes when its image status changes."""
+        etag = self.client.get(self.url)['ETag']
+        enqueue_image(self.recipe)
+
+        res = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['image_status'], Recipe.IMAGE_PENDING)
+
+    def test_detail_etag_ignores_unrelated_write(self):
+        """Test unrelated writes of the user keep the detail ETag."""
+        etag = self.client.get(self.url)['ETag']
+        Tag.objects.create(user=self.user, name='Vegan')
+        sample_recipe(user=self.user, title='Other recipe')
+
+        res = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_if_none_match_any_missing_recipe(self):
+        """Test If-None-Match: * on a missing or foreign recipe is a 404."""
+        other = get_user_model().objects.create_user(
+            'other@example.com',
+            'simple123'
+        )
+        foreign = sample_recipe(user=other)
+
+        for recipe_id in (self.recipe.id + 1000, foreign.id):
+            url = reverse('recipe:recipe-detail', args=[recipe_id])
+            res = self.client.get(url, HTTP_IF_NONE_MATCH='*')
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_etag_differs_per_path_and_params(self):
+        """Test list, filtered list and detail have distinct ETags."""
+        etags = {
+            self.client.get(RECIPE_URL)['ETag'],
+            self.client.get(RECIPE_URL, {'tags': '1'})['ETag'],
+            self.client.get(self.url)['ETag'],
+        }
+
+        self.assertEqual(len(etags), 3)
+
+    def test_if_match_update(self):
+        """Test PATCH with a current If-Match succeeds."""
+        etag = self.client.get(self.url)['ETag']
+
+        res = self.client.patch(
+            self.url,
+            {'title': 'New title'},
+            HTTP_IF_MATCH=etag
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+        self.assertEqual(self.client.get(self.url)['ETag'], res['ETag'])
+
+    def test_if_match_stale_rejected(self):
+        """Test PATCH with a stale If-Match is rejected."""
+        etag = self.client.get(self.url)['ETag']
+        self.recipe.title = 'Changed elsewhere'
+        self.recipe.save()
+
+        res = self.client.patch(
+            self.url,
+            {'title': 'New title'},
+            HTTP_IF_MATCH=etag
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.title, 'Changed elsewhere')
+
+    def test_update_etag_read_under_lock(self):
+        """Test an update locks the row and returns the ETag of its body."""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.patch(self.url, {'title': 'New title'})
+
+        sql = [
+            query['sql'] for query in queries.captured_queries
+            if not query['sql'].startswith(('SAVEPOINT', 'RELEASE'))
+        ]
+        self.assertIn('FOR UPDATE', sql[0])
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['ETag'], self.client.get(self.url)['ETag'])
+
+    def test_if_match_ignores_unrelated_write(self):
+        """Test PATCH with If-Match succeeds after an unrelated write."""
+        etag = self.client.get(self.url)['ETag']
+        Tag.objects.create(user=self.user, name='Vegan')
+
+        res = self.client.patch(
+            self.url,
+            {'title': 'New title'},
+            HTTP_IF_MATCH=etag
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+
+@override_settings(RECIPE_CACHE_ENABLED=False)
+class ProcessLocalCacheTests(TestCase):
+    """Test responses are not cached without a shared cache."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'local@example.com',
+            'simple123'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_list_not_cached(self):
+        """Test lists are read from the database without ETags."""
+        sample_recipe(user=self.user)
+        self.client.get(RECIPE_URL)
+        # A write in another process leaves this process's version as is.
+        Recipe.objects.update(title='Changed elsewhere')
+
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.data['results'][0]['title'], 'Changed elsewhere')
+        self.assertNotIn('ETag', res)
+
+    def test_detail_etag_from_row(self):
+        """Test details still answer conditional requests from their row."""
+        recipe = sample_recipe(user=self.user)
+        url = reverse('recipe:recipe-detail', args=[recipe.id])
+        etag = self.client.get(url)['ETag']
+
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
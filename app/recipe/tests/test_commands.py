@@ -0,0 +1,98 @@
+"""
+Test recipe management commands
+"""
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from core.models import Recipe
+
+
+class CommandTests(TestCase):
+    """Test the benchmark and explain commands."""
+
+    def setUp(self):
+        call_command(
+            'seed_recipes',
+            recipes=20,
+            tags=5,
+            ingredients=5,
+            email='bench@example.com',
+            stdout=StringIO()
+        )
+
+    def test_seed_recipes(self):
+        """Test seeding creates recipes for the user."""
+        recipes = Recipe.objects.filter(user__email='bench@example.com')
+
+        self.assertEqual(recipes.count(), 20)
+
+    def test_benchmark_filters(self):
+        """Test the filters benchmark reports each query."""
+        out = StringIO()
+
+        call_command('benchmark', 'filters', repeat=1, stdout=out)
+
+        self.assertIn('exists (match any)', out.getvalue())
+        self.assertIn('grouped semi-join (match all)', out.getvalue())
+
+    def test_benchmark_search(self):
+        """Test the search benchmark compares LIKE and full-text."""
+        out = StringIO()
+
+        call_command('benchmark', 'search', repeat=1, stdout=out)
+
+        self.assertIn('like scan', out.getvalue())
+        self.assertIn('full-text (ranked)', out.getvalue())
+
+    def test_benchmark_facets(self):
+        """Test the facets benchmark reports each query."""
+        out = StringIO()
+
+        call_command('benchmark', 'facets', repeat=1, stdout=out)
+
+        self.assertIn('tags join + group', out.getvalue())
+        self.assertIn('facet counts (filtered)', out.getvalue())
+
+    def test_benchmark_list(self):
+        """Test the list benchmark times each field set."""
+        out = StringIO()
+
+        call_command('benchmark', 'list', repeat=1, stdout=out)
+
+        self.assertIn('full:', out.getvalue())
+        self.assertIn('fields=id,title,time_minutes:', out.getvalue())
+
+    def test_benchmark_serialize(self):
+        """Test the serialize benchmark compares both paths."""
+        out = StringIO()
+
+        call_command('benchmark', 'serialize', repeat=1, stdout=out)
+
+        self.assertIn('serializers + queries:', out.getvalue())
+        self.assertIn('values rows + queries:', out.getvalue())
+
+    def test_benchmark_render(self):
+        """Test the render benchmark reports each renderer."""
+        out = StringIO()
+
+        call_command('benchmark', 'render', repeat=1, stdout=out)
+
+        self.assertIn('JSONRenderer:', out.getvalue())
+        self.assertIn('ORJSONRenderer:', out.getvalue())
+        self.assertIn('MessagePackRenderer:', out.getvalue())
+
+    def test_explain_queries(self):
+        """Test EXPLAIN is reported for every endpoint."""
+        out = StringIO()
+
+        call_command('explain_queries', stdout=out)
+
+        for label in (
+            'recipe list:',
+            'recipe detail:',
+            'tag list assigned_only:',
+            'ingredient list:',
+        ):
+            self.assertIn(label, out.getvalue())
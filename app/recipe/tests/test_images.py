@@ -0,0 +1,492 @@
+"""
+Tests for the recipe image processing pipeline.
+"""
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest.mock import patch
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import ImageJob, Recipe
+from recipe.images import process_pending, variant_formats
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def image_upload_url(recipe_id):
+    """Create and return a recipe image upload URL."""
+    return reverse('recipe:recipe-upload-image', args=[recipe_id])
+
+
+def detail_url(recipe_id):
+    """Create and return a recipe detail URL."""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def sample_image(size=(1200, 900), exif=True):
+    """Return an in-memory JPEG upload."""
+    image = Image.new('RGB', size, 'red')
+    buffer = BytesIO()
+    extra = {}
+    if exif:
+        info = Image.Exif()
+        info[0x010F] = 'Camera maker'
+        extra['exif'] = info.tobytes()
+    image.save(buffer, format='JPEG', **extra)
+    buffer.name = 'photo.jpg'
+    buffer.seek(0)
+    return buffer
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ImageProcessingTests(TestCase):
+    """Test uploaded images are processed into variants."""
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'images@example.com',
+            'simple123'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='Soup',
+            time_minutes=10,
+            price=5.00
+        )
+
+    def upload(self, image=None):
+        return self.client.post(
+            image_upload_url(self.recipe.id),
+            {'image': image or sample_image()},
+            format='multipart'
+        )
+
+    def test_upload_queues_job(self):
+        """Test uploading an image queues processing"""
+        res = self.upload()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['image_status'], Recipe.IMAGE_PENDING)
+        self.assertEqual(res.data['image_variants'], {})
+        self.assertTrue(
+            ImageJob.objects.filter(
+                recipe=self.recipe,
+                status=ImageJob.PENDING
+            ).exists()
+        )
+
+    def test_process_creates_variants(self):
+        """Test processing renders every variant and format"""
+        self.upload()
+
+        processed = process_pending()
+
+        self.assertEqual(processed, 1)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_READY)
+        variants = self.recipe.image_variants
+        self.assertEqual(
+            set(variants),
+            {'thumbnail', 'medium', 'full'}
+        )
+        for name, formats in variants.items():
+            self.assertEqual(set(formats), set(variant_formats()))
+
+        with Image.open(
+            os.path.join(MEDIA_ROOT, variants['thumbnail']['jpg'])
+        ) as thumb:
+            self.assertEqual(thumb.size, (200, 200))
+            self.assertEqual(len(thumb.getexif()), 0)
+        with Image.open(
+            os.path.join(MEDIA_ROOT, variants['medium']['jpg'])
+        ) as medium:
+            self.assertEqual(medium.size, (800, 600))
+
+    def test_detail_returns_variant_urls(self):
+        """Test the detail view returns variant URLs once ready"""
+        self.upload()
+        call_command('process_images', once=True, stdout=StringIO())
+
+        res = self.client.get(detail_url(self.recipe.id))
+
+        self.assertEqual(res.data['image_status'], Recipe.IMAGE_READY)
+        url = res.data['image_variants']['thumbnail']['jpg']
+        self.assertTrue(url.startswith('http://testserver/static/media/'))
+
+    def test_reupload_replaces_variants(self):
+        """Test processing a new upload removes the old variants"""
+        self.upload()
+        process_pending()
+        self.recipe.refresh_from_db()
+        old_path = self.recipe.image_variants['full']['jpg']
+
+        self.upload()
+        process_pending()
+
+        self.assertFalse(os.path.exists(os.path.join(MEDIA_ROOT, old_path)))
+
+    def test_invalid_image_fails(self):
+        """Test a job gives up after the configured attempts"""
+        self.upload(sample_image(size=(300, 200)))
+        self.recipe.refresh_from_db()
+        with open(self.recipe.image.path, 'wb') as image_file:
+            image_file.write(b'not an image')
+
+        with self.assertLogs('recipe.images', 'ERROR'):
+            process_pending()
+
+        self.recipe.refresh_from_db()
+        job = ImageJob.objects.get(recipe=self.recipe)
+        self.assertEqual(job.status, ImageJob.FAILED)
+        self.assertEqual(job.attempts, 3)
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_FAILED)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ImageUploadLimitTests(TestCase):
+    """Test uploads are streamed and checked before decoding."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'limits@example.com',
+            'simple123'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='Soup',
+            time_minutes=10,
+            price=5.00
+        )
+        self.url = image_upload_url(self.recipe.id)
+
+    def test_oversized_upload_rejected(self):
+        """Test uploads over the size limit return 413"""
+        with self.settings(RECIPE_IMAGE_MAX_UPLOAD_SIZE=1024):
+            res = self.client.post(
+                self.url,
+                {'image': sample_image()},
+                format='multipart'
+            )
+
+        self.assertEqual(
+            res.status_code,
+            status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        )
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image)
+
+    def test_unexpected_content_type_rejected(self):
+        """Test non-image uploads return 415"""
+        upload = BytesIO(b'plain text')
+        upload.name = 'notes.txt'
+
+        res = self.client.post(self.url, {'image': upload}, format='multipart')
+
+        self.assertEqual(
+            res.status_code,
+            status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+        )
+
+    def test_invalid_image_rejected(self):
+        """Test bytes that are not an image return 400"""
+        upload = BytesIO(b'not an image')
+        upload.name = 'photo.jpg'
+
+        res = self.client.post(self.url, {'image': upload}, format='multipart')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_decompression_bomb_rejected(self):
+        """Test images with too many pixels are rejected"""
+        with self.settings(RECIPE_IMAGE_MAX_PIXELS=100 * 100):
+            res = self.client.post(
+                self.url,
+                {'image': sample_image(size=(101, 100))},
+                format='multipart'
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('image', res.data)
+
+    def test_upload_does_not_decode(self):
+        """Test validation reads only the image header"""
+        upload = sample_image()
+        with patch.object(Image.Image, 'load') as load:
+            res = self.client.post(
+                self.url,
+                {'image': upload},
+                format='multipart'
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        load.assert_not_called()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ImageStorageTests(TestCase):
+    """Test recipe images are stored once and released when unused."""
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'storage@example.com',
+            'simple123'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipes = [
+            Recipe.objects.create(
+                user=self.user,
+                title=f'Soup {i}',
+                time_minutes=10,
+                price=5.00
+            )
+            for i in range(2)
+        ]
+
+    def upload(self, recipe, size):
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post(
+                image_upload_url(recipe.id),
+                {'image': sample_image(size=size, exif=False)},
+                format='multipart'
+            )
+        recipe.refresh_from_db()
+        return res
+
+    def test_identical_uploads_stored_once(self):
+        """Test identical bytes are stored in a single file"""
+        for recipe in self.recipes:
+            self.upload(recipe, (320, 240))
+
+        first, second = self.recipes
+        self.assertEqual(first.image.name, second.image.name)
+        directory = os.path.dirname(first.image.path)
+        name = os.path.basename(first.image.name)
+        self.assertEqual(
+            [f for f in os.listdir(directory) if f.startswith(name[:64])],
+            [name]
+        )
+
+    def test_save_racing_same_content(self):
+        """Test saving a name another save just stored keeps that file"""
+        storage = Recipe._meta.get_field('image').storage
+        name = 'uploads/recipe/ab/cd/abcd.jpg'
+        storage.save(name, ContentFile(b'stored'))
+
+        with patch('core.storage.os.path.exists', return_value=False):
+            saved = storage.save(name, ContentFile(b'stored'))
+
+        self.assertEqual(saved, name)
+        self.assertEqual(
+            os.listdir(os.path.dirname(storage.path(name))),
+            ['abcd.jpg']
+        )
+        with storage.open(name) as stored:
+            self.assertEqual(stored.read(), b'stored')
+
+    def test_replaced_image_released(self):
+        """Test a replaced image is deleted when no recipe uses it"""
+        recipe = self.recipes[0]
+        self.upload(recipe, (330, 240))
+        old_path = recipe.image.path
+
+        self.upload(recipe, (340, 240))
+
+        self.assertFalse(os.path.exists(old_path))
+        self.assertTrue(os.path.exists(recipe.image.path))
+
+    def test_image_replaced_by_model_save_released(self):
+        """Test an image replaced outside the API is released"""
+        self.upload(self.recipes[0], (335, 240))
+        recipe = Recipe.objects.get(id=self.recipes[0].id)
+        old_path = recipe.image.path
+
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.image = ContentFile(
+                sample_image(size=(345, 240), exif=False).getvalue(),
+                name='replacement.jpg'
+            )
+            recipe.save()
+
+        self.assertFalse(os.path.exists(old_path))
+        self.assertTrue(os.path.exists(recipe.image.path))
+
+    def test_shared_image_kept(self):
+        """Test a replaced image still used by another recipe is kept"""
+        first, second = self.recipes
+        self.upload(first, (350, 240))
+        self.upload(second, (350, 240))
+
+        self.upload(first, (360, 240))
+
+        self.assertTrue(os.path.exists(second.image.path))
+
+    def test_delete_recipe_releases_files(self):
+        """Test deleting a recipe removes its image and variants"""
+        recipe = self.recipes[0]
+        self.upload(recipe, (370, 240))
+        process_pending()
+        recipe.refresh_from_db()
+        paths = [recipe.image.path] + [
+            os.path.join(MEDIA_ROOT, path)
+            for formats in recipe.image_variants.values()
+            for path in formats.values()
+        ]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.delete()
+
+        for path in paths:
+            self.assertFalse(os.path.exists(path))
+
+    def test_dedupe_images_command(self):
+        """Test legacy images are moved to content paths and deduplicated"""
+        storage = Recipe._meta.get_field('image').storage
+        content = sample_image(size=(380, 240), exif=False).getvalue()
+        for i, recipe in enumerate(self.recipes):
+            name = storage.save(
+                f'uploads/recipe/legacy-{i}.jpg',
+                ContentFile(content)
+            )
+            Recipe.objects.filter(id=recipe.id).update(image=name)
+        orphan = storage.save('uploads/recipe/orphan.jpg', ContentFile(b'x'))
+        out = StringIO()
+
+        call_command('dedupe_images', stdout=out)
+
+        first, second = Recipe.objects.filter(
+            id__in=[r.id for r in self.recipes]
+        ).order_by('id')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertNotIn('legacy', first.image.name)
+        self.assertTrue(storage.exists(first.image.name))
+        for name in ('uploads/recipe/legacy-0.jpg', orphan):
+            self.assertFalse(storage.exists(name))
+        self.assertIn('Moved 2 images, deleted 3 files', out.getvalue())
+
+    def test_dedupe_images_removes_sharded_orphans(self):
+        """Test orphans in shard directories are deleted, variants kept"""
+        storage = Recipe._meta.get_field('image').storage
+        self.upload(self.recipes[0], (385, 240))
+        process_pending()
+        recipe = Recipe.objects.get(id=self.recipes[0].id)
+        orphan = storage.save(
+            'uploads/recipe/ab/cd/abcd.jpg',
+            ContentFile(b'x')
+        )
+
+        call_command('dedupe_images', stdout=StringIO())
+
+        self.assertFalse(storage.exists(orphan))
+        self.assertTrue(storage.exists(recipe.image.name))
+        for formats in recipe.image_variants.values():
+            for path in formats.values():
+                self.assertTrue(storage.exists(path))
+
+    def test_dedupe_images_dry_run(self):
+        """Test a dry run reports without changing anything"""
+        storage = Recipe._meta.get_field('image').storage
+        name = storage.save(
+            'uploads/recipe/legacy-dry.jpg',
+            ContentFile(sample_image(size=(390, 240)).getvalue())
+        )
+        Recipe.objects.filter(id=self.recipes[0].id).update(image=name)
+        out = StringIO()
+
+        call_command('dedupe_images', dry_run=True, stdout=out)
+
+        self.recipes[0].refresh_from_db()
+        self.assertEqual(self.recipes[0].image.name, name)
+        self.assertTrue(storage.exists(name))
+        self.assertIn('Moved 1 images', out.getvalue())
+
+    def test_shard_images_command(self):
+        """Test flat images and variants are moved into shard directories"""
+        storage = Recipe._meta.get_field('image').storage
+        recipe = self.recipes[0]
+        image = sample_image(size=(400, 240)).getvalue()
+        name = storage.save('uploads/recipe/0a1b2c.jpg', ContentFile(image))
+        variant = storage.save(
+            'uploads/recipe/variants/0a1b2c/full.jpg',
+            ContentFile(image)
+        )
+        Recipe.objects.filter(id=recipe.id).update(
+            image=name,
+            image_variants={'full': {'jpg': variant}}
+        )
+        out = StringIO()
+
+        call_command('shard_images', batch_size=1, workers=2, stdout=out)
+
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image.name, 'uploads/recipe/0a/1b/0a1b2c.jpg')
+        self.assertEqual(
+            recipe.image_variants['full']['jpg'],
+            'uploads/recipe/variants/0a/1b/0a1b2c/full.jpg'
+        )
+        self.assertTrue(storage.exists(recipe.image.name))
+        self.assertTrue(storage.exists(recipe.image_variants['full']['jpg']))
+        self.assertFalse(storage.exists(name))
+        self.assertFalse(storage.exists(variant))
+        self.assertIn('Moved 1 images', out.getvalue())
+
+    def test_shard_images_shared_image(self):
+        """Test recipes sharing a flat image switch to a single copy"""
+        storage = Recipe._meta.get_field('image').storage
+        name = storage.save(
+            'uploads/recipe/0c1d2e.jpg',
+            ContentFile(sample_image(size=(405, 240)).getvalue())
+        )
+        Recipe.objects.update(image=name)
+        out = StringIO()
+
+        call_command('shard_images', workers=4, stdout=out)
+
+        names = set(Recipe.objects.values_list('image', flat=True))
+        self.assertEqual(names, {'uploads/recipe/0c/1d/0c1d2e.jpg'})
+        self.assertEqual(
+            os.listdir(os.path.join(MEDIA_ROOT, 'uploads/recipe/0c/1d')),
+            ['0c1d2e.jpg']
+        )
+        self.assertFalse(storage.exists(name))
+        self.assertIn('Moved 2 images', out.getvalue())
+
+    def test_shard_images_resumes(self):
+        """Test rerunning after a completed relocation changes nothing"""
+        self.upload(self.recipes[0], (410, 240))
+        name = Recipe.objects.get(id=self.recipes[0].id).image.name
+        out = StringIO()
+
+        call_command('shard_images', stdout=out)
+
+        self.assertEqual(
+            Recipe.objects.get(id=self.recipes[0].id).image.name,
+            name
+        )
+        self.assertIn('Moved 0 images', out.getvalue())
@@ -136,4 +136,27 @@ class PrivateIngredientAPITest(TestCase):
 
         res = self.client.get(INGREDIENT_URL, {'assigned_only': 1})
 
-        self.assertEqual(len(res.data), 1)
\ No newline at end of file
+        self.assertEqual(len(res.data), 1)
+
+    def test_ingredients_with_recipe_count(self):
+        """Test listing ingredients with the number of recipes using them."""
+        in1 = Ingredient.objects.create(user=self.user, name='Rice')
+        in2 = Ingredient.objects.create(user=self.user, name='Beans')
+        for ingredients in ([in1, in2], [in1]):
+            recipe = Recipe.objects.create(
+                user=self.user,
+                title='Recipe Test Name',
+                time_minutes=5,
+                price=Decimal('5.30')
+            )
+            recipe.ingredients.add(*ingredients)
+
+        res = self.client.get(
+            INGREDIENT_URL,
+            {'recipe_count': 1, 'assigned_only': 1}
+        )
+
+        self.assertEqual(
+            [(i['name'], i['recipe_count']) for i in res.data],
+            [('Rice', 2), ('Beans', 1)]
+        )
@@ -4,11 +4,16 @@ Test for recipe APIS
 from decimal import Decimal
 import tempfile
 import os
+import threading
+from unittest import skipUnless
+from unittest.mock import patch
 
 from PIL import Image
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework import status
@@ -22,6 +27,8 @@ from core.models import (
 from recipe.serializers import RecipeDetailSerializer, RecipeSerializer
 
 RECIPE_URL = reverse('recipe:recipe-list')
+BULK_URL = reverse('recipe:recipe-bulk')
+FACETS_URL = reverse('recipe:recipe-facets')
 
 def detial_url(recipe_id):
     return reverse('recipe:recipe-detail', args=[recipe_id])
@@ -40,6 +47,13 @@ def sample_recipe(user, **params):
     defaults.update(params)
     return Recipe.objects.create(user=user, **defaults)
 
+def count_queries(func, *args, **kwargs):
+    """Return the number of queries executed by a call."""
+    with CaptureQueriesContext(connection) as ctx:
+        func(*args, **kwargs)
+
+    return len(ctx.captured_queries)
+
 class PublicRecipeApiTests(TestCase):
     """Test unauthenticated recipe API access"""
 
@@ -72,7 +86,7 @@ class PrivateRecipeApiTests(TestCase):
         recipes = Recipe.objects.all().order_by('-id')
         serializer = RecipeSerializer(recipes, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_recipes_limited_to_user(self):
         """Test reterieving recipes for user"""
@@ -90,8 +104,8 @@ class PrivateRecipeApiTests(TestCase):
         serializer = RecipeSerializer(recipes, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_view_recipe_detail(self):
         """Test viewing a recipe detail"""
@@ -196,6 +210,45 @@ class PrivateRecipeApiTests(TestCase):
             ).exists()
             self.assertTrue(exists)
 
+    def test_create_recipe_reuses_tags_ignoring_case(self):
+        """Test tag names are matched case-insensitively."""
+        tag = Tag.objects.create(user=self.user, name='Indian')
+        payload = {
+            'title': 'Dal',
+            'time_minutes': 30,
+            'price': '3.00',
+            'tags': [{'name': 'indian'}, {'name': 'INDIAN'}],
+        }
+        res = self.client.post(RECIPE_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        recipe = Recipe.objects.get(id=res.data['id'])
+        self.assertEqual(list(recipe.tags.all()), [tag])
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 1)
+
+    def test_create_recipe_with_non_ascii_tags(self):
+        """Test names Python and the database lowercase differently."""
+        tag = Tag.objects.create(user=self.user, name='ΣΑΣ')
+        payload = {
+            'title': 'Kebab',
+            'time_minutes': 30,
+            'price': '6.00',
+            'tags': [{'name': 'İstanbul'}, {'name': 'ΣΑΣ'}, {'name': 'σας'}],
+        }
+        res = self.client.post(RECIPE_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        recipe = Recipe.objects.get(id=res.data['id'])
+        self.assertIn(tag, recipe.tags.all())
+        self.assertTrue(recipe.tags.filter(name='İstanbul').exists())
+
+        res = self.client.patch(
+            detial_url(recipe.id),
+            {'tags': [{'name': 'İstanbul'}]},
+            format='json'
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
     def test_create_tag_on_update(self):
         """Test creating tag when updating a recipe."""
         recipe = sample_recipe(user=self.user)
@@ -236,6 +289,52 @@ class PrivateRecipeApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(recipe.tags.count(), 0)
 
+    def test_update_recipe_tags_diff(self):
+        """Test updating tags only writes the changed through rows."""
+        tag1 = Tag.objects.create(user=self.user, name='Breakfast')
+        tag2 = Tag.objects.create(user=self.user, name='Lunch')
+        recipe = sample_recipe(user=self.user)
+        recipe.tags.add(tag1, tag2)
+        kept = Recipe.tags.through.objects.get(recipe=recipe, tag=tag1)
+
+        payload = {'tags': [{'name': 'Breakfast'}, {'name': 'Dinner'}]}
+        url = detial_url(recipe.id)
+        res = self.client.patch(url, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        names = sorted(tag['name'] for tag in res.data['tags'])
+        self.assertEqual(names, ['Breakfast', 'Dinner'])
+        self.assertTrue(
+            Recipe.tags.through.objects.filter(id=kept.id).exists()
+        )
+        self.assertNotIn(tag2, recipe.tags.all())
+
+    def test_noop_update_makes_no_through_writes(self):
+        """Test a PATCH with unchanged tags and ingredients writes no rows."""
+        recipe = sample_recipe(user=self.user)
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+        recipe.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Salt')
+        )
+
+        payload = {
+            'tags': [{'name': 'Vegan'}],
+            'ingredients': [{'name': 'Salt'}],
+        }
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.patch(
+                detial_url(recipe.id),
+                payload,
+                format='json'
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        writes = [
+            q['sql'] for q in ctx.captured_queries
+            if q['sql'].startswith(('INSERT', 'DELETE'))
+        ]
+        self.assertEqual(writes, [])
+
     def test_create_recipe_with_new_ingredients(self):
         """Test creating a recipe with new ingredients."""
         payload = {
@@ -340,9 +439,9 @@ class PrivateRecipeApiTests(TestCase):
         s3 = RecipeSerializer(r3)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertIn(s1.data, res.data)
-        self.assertIn(s2.data, res.data)
-        self.assertNotIn(s3.data, res.data)
+        self.assertIn(s1.data, res.data['results'])
+        self.assertIn(s2.data, res.data['results'])
+        self.assertNotIn(s3.data, res.data['results'])
 
     def test_filter_by_ingredients(self):
         """Test filtering recipes by ingredients."""
@@ -362,9 +461,643 @@ class PrivateRecipeApiTests(TestCase):
         s3 = RecipeSerializer(r3)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertIn(s1.data, res.data)
-        self.assertIn(s2.data, res.data)
-        self.assertNotIn(s3.data, res.data)
+        self.assertIn(s1.data, res.data['results'])
+        self.assertIn(s2.data, res.data['results'])
+        self.assertNotIn(s3.data, res.data['results'])
+
+    def test_filter_matching_several_tags_unique(self):
+        """Test a recipe matching several filter tags is listed once."""
+        recipe = sample_recipe(user=self.user)
+        tag1 = Tag.objects.create(user=self.user, name='Vegan')
+        tag2 = Tag.objects.create(user=self.user, name='Dinner')
+        recipe.tags.add(tag1, tag2)
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(
+                RECIPE_URL,
+                {'tags': f'{tag1.id},{tag2.id}'}
+            )
+
+        self.assertEqual(len(res.data['results']), 1)
+        for query in ctx.captured_queries:
+            self.assertNotIn('DISTINCT', query['sql'])
+
+    def test_filter_match_all_tags(self):
+        """Test filtering recipes having all of the tags."""
+        tag1 = Tag.objects.create(user=self.user, name='Vegan')
+        tag2 = Tag.objects.create(user=self.user, name='Dinner')
+        ingredient = Ingredient.objects.create(user=self.user, name='Salt')
+        r1 = sample_recipe(user=self.user, title='both tags')
+        r1.tags.add(tag1, tag2)
+        r1.ingredients.add(ingredient)
+        r2 = sample_recipe(user=self.user, title='one tag')
+        r2.tags.add(tag1)
+        r2.ingredients.add(ingredient)
+
+        params = {
+            'tags': f'{tag1.id},{tag2.id},{tag2.id}',
+            'ingredients': f'{ingredient.id}',
+            'match': 'all',
+        }
+        res = self.client.get(RECIPE_URL, params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        ids = [r['id'] for r in res.data['results']]
+        self.assertEqual(ids, [r1.id])
+
+    def test_list_paginated_by_cursor(self):
+        """Test recipes are paged newest first with a cursor."""
+        recipes = [sample_recipe(user=self.user) for _ in range(3)]
+
+        res = self.client.get(RECIPE_URL, {'page_size': 2})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        ids = [r['id'] for r in res.data['results']]
+        self.assertEqual(ids, [recipes[2].id, recipes[1].id])
+        self.assertIsNone(res.data['previous'])
+
+        res = self.client.get(res.data['next'])
+
+        ids = [r['id'] for r in res.data['results']]
+        self.assertEqual(ids, [recipes[0].id])
+        self.assertIsNone(res.data['next'])
+
+    @patch('recipe.pagination.RecipeCursorPagination.max_page_size', 2)
+    def test_page_size_limited_to_maximum(self):
+        """Test the client page size is capped by the server."""
+        for _ in range(3):
+            sample_recipe(user=self.user)
+
+        res = self.client.get(RECIPE_URL, {'page_size': 100})
+
+        self.assertEqual(len(res.data['results']), 2)
+        self.assertIsNotNone(res.data['next'])
+
+    def test_pagination_with_filter(self):
+        """Test paging through filtered recipes."""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        r1 = sample_recipe(user=self.user)
+        r1.tags.add(tag)
+        sample_recipe(user=self.user)
+        r3 = sample_recipe(user=self.user)
+        r3.tags.add(tag)
+        sample_recipe(user=self.user)
+
+        params = {'tags': f'{tag.id}', 'page_size': 1}
+        res = self.client.get(RECIPE_URL, params)
+        ids = [r['id'] for r in res.data['results']]
+        res = self.client.get(res.data['next'])
+        ids += [r['id'] for r in res.data['results']]
+
+        self.assertEqual(ids, [r3.id, r1.id])
+        self.assertIsNone(res.data['next'])
+
+    @skipUnless(connection.vendor == 'postgresql', 'Needs full-text search')
+    def test_search_recipes_stemmed(self):
+        """Test searching recipes matches word forms on PostgreSQL."""
+        r1 = sample_recipe(user=self.user, title='Thai green curry')
+        r2 = sample_recipe(
+            user=self.user,
+            title='Rice bowl',
+            description='Served with a mild curry sauce.'
+        )
+        sample_recipe(user=self.user, title='Pancakes')
+
+        res = self.client.get(RECIPE_URL, {'search': 'curries'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        ids = [r['id'] for r in res.data['results']]
+        self.assertEqual(ids, [r1.id, r2.id])
+
+    def test_search_recipes(self):
+        """Test searching recipes for every word of the terms."""
+        r1 = sample_recipe(user=self.user, title='Thai green curry')
+        r2 = sample_recipe(
+            user=self.user,
+            title='Rice bowl',
+            description='Served with a mild curry sauce.'
+        )
+        sample_recipe(user=self.user, title='Green salad')
+
+        for terms, expected in (
+            ('curry', [r2.id, r1.id]),
+            ('green curry', [r1.id]),
+            ('mild rice', [r2.id]),
+        ):
+            res = self.client.get(RECIPE_URL, {'search': terms})
+            ids = [r['id'] for r in res.data['results']]
+            self.assertEqual(sorted(ids), sorted(expected))
+
+    def test_search_fallback_matches_every_word(self):
+        """Test the search used off PostgreSQL needs every word."""
+        r1 = sample_recipe(user=self.user, title='Thai green curry')
+        sample_recipe(user=self.user, title='Green salad')
+
+        with patch.object(connection, 'vendor', 'sqlite'):
+            res = self.client.get(RECIPE_URL, {'search': 'green  curry'})
+
+        ids = [r['id'] for r in res.data['results']]
+        self.assertEqual(ids, [r1.id])
+
+    def test_search_updated_on_write(self):
+        """Test the search index follows title changes."""
+        recipe = sample_recipe(user=self.user, title='Tomato soup')
+        self.client.patch(detial_url(recipe.id), {'title': 'Onion soup'})
+
+        res = self.client.get(RECIPE_URL, {'search': 'onion'})
+
+        ids = [r['id'] for r in res.data['results']]
+        self.assertEqual(ids, [recipe.id])
+        res = self.client.get(RECIPE_URL, {'search': 'tomato'})
+        self.assertEqual(res.data['results'], [])
+
+    def test_search_paginated_by_rank(self):
+        """Test paging through ranked search results."""
+        recipes = [
+            sample_recipe(user=self.user, title=f'Lemon cake {i}')
+            for i in range(3)
+        ]
+        best = sample_recipe(user=self.user, title='Lemon lemon tart')
+
+        res = self.client.get(RECIPE_URL, {'search': 'lemon', 'page_size': 2})
+        ids = [r['id'] for r in res.data['results']]
+        while res.data['next']:
+            res = self.client.get(res.data['next'])
+            ids += [r['id'] for r in res.data['results']]
+
+        self.assertEqual(ids, [best.id] + [r.id for r in recipes[::-1]])
+
+    def test_facet_counts(self):
+        """Test counting recipes per tag and ingredient."""
+        vegan = Tag.objects.create(user=self.user, name='Vegan')
+        quick = Tag.objects.create(user=self.user, name='Quick')
+        Tag.objects.create(user=self.user, name='Unused')
+        rice = Ingredient.objects.create(user=self.user, name='Rice')
+        r1 = sample_recipe(user=self.user)
+        r2 = sample_recipe(user=self.user)
+        r1.tags.add(vegan, quick)
+        r2.tags.add(vegan)
+        r2.ingredients.add(rice)
+        other = get_user_model().objects.create_user(
+            'other@example.com',
+            'pass123'
+        )
+        sample_recipe(user=other).tags.add(
+            Tag.objects.create(user=other, name='Vegan')
+        )
+
+        res = self.client.get(FACETS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {
+            'tags': [
+                {'id': vegan.id, 'name': 'Vegan', 'count': 2},
+                {'id': quick.id, 'name': 'Quick', 'count': 1},
+            ],
+            'ingredients': [
+                {'id': rice.id, 'name': 'Rice', 'count': 1},
+            ],
+        })
+
+    def test_facet_counts_follow_filters(self):
+        """Test facet counts only cover the filtered recipes."""
+        vegan = Tag.objects.create(user=self.user, name='Vegan')
+        quick = Tag.objects.create(user=self.user, name='Quick')
+        rice = Ingredient.objects.create(user=self.user, name='Rice')
+        r1 = sample_recipe(user=self.user, title='Fried rice')
+        r2 = sample_recipe(user=self.user, title='Salad')
+        r1.tags.add(vegan, quick)
+        r1.ingredients.add(rice)
+        r2.tags.add(vegan)
+
+        res = self.client.get(FACETS_URL, {'tags': quick.id})
+        self.assertEqual(
+            [(f['name'], f['count']) for f in res.data['tags']],
+            [('Quick', 1), ('Vegan', 1)]
+        )
+        self.assertEqual(len(res.data['ingredients']), 1)
+
+        res = self.client.get(FACETS_URL, {'search': 'salad'})
+        self.assertEqual(
+            [(f['name'], f['count']) for f in res.data['tags']],
+            [('Vegan', 1)]
+        )
+        self.assertEqual(res.data['ingredients'], [])
+
+    def test_sparse_fields_list(self):
+        """Test ?fields= limits the listed fields and skips prefetches."""
+        recipe = sample_recipe(user=self.user)
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+        params = {'fields': 'id,title,time_minutes'}
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(RECIPE_URL, params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'], [
+            {'id': recipe.id, 'title': recipe.title, 'time_minutes': 10}
+        ])
+        sql = ' '.join(q['sql'] for q in ctx.captured_queries)
+        self.assertNotIn('core_tag', sql)
+        self.assertNotIn('core_ingredient', sql)
+
+    def test_sparse_fields_nested(self):
+        """Test nested fields are complete and only their data fetched."""
+        recipe = sample_recipe(user=self.user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        recipe.tags.add(tag)
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(detial_url(recipe.id), {'fields': 'tags'})
+
+        self.assertEqual(res.data, {'tags': [{'id': tag.id, 'name': 'Vegan'}]})
+        sql = ' '.join(q['sql'] for q in ctx.captured_queries)
+        self.assertNotIn('core_ingredient', sql)
+
+    def test_sparse_fields_detail_and_unknown(self):
+        """Test ?fields= on a detail ignores unknown names."""
+        recipe = sample_recipe(user=self.user, description='Slow cooked.')
+
+        res = self.client.get(
+            detial_url(recipe.id),
+            {'fields': 'description,secret'}
+        )
+
+        self.assertEqual(res.data, {'description': 'Slow cooked.'})
+
+    def test_sparse_fields_ignored_on_write(self):
+        """Test writes validate and return every field."""
+        payload = {'title': 'Soup', 'time_minutes': 5, 'price': '1.00'}
+
+        res = self.client.post(f'{RECIPE_URL}?fields=id', payload)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['title'], 'Soup')
+        self.assertIn('tags', res.data)
+
+class BulkRecipeApiTests(TestCase):
+    """Test the bulk recipe create and update API."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'bulk@example.com',
+            'simple123'
+        )
+        self.client.force_authenticate(self.user)
+
+    def _payload(self, count, prefix='tag'):
+        return [
+            {
+                'title': f'recipe {i}',
+                'time_minutes': 10,
+                'price': '5.00',
+                'tags': [{'name': 'Dinner'}, {'name': f'{prefix} {i}'}],
+                'ingredients': [{'name': 'Salt'}],
+            }
+            for i in range(count)
+        ]
+
+    def test_bulk_create_recipes(self):
+        """Test creating a list of recipes."""
+        tag = Tag.objects.create(user=self.user, name='Dinner')
+
+        res = self.client.post(BULK_URL, self._payload(3), format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data), 3)
+        recipes = Recipe.objects.filter(user=self.user).order_by('id')
+        self.assertEqual(recipes.count(), 3)
+        for result, recipe in zip(res.data, recipes):
+            self.assertEqual(result['status'], status.HTTP_201_CREATED)
+            self.assertEqual(
+                result['data'],
+                RecipeDetailSerializer(recipe).data
+            )
+            self.assertIn(tag, recipe.tags.all())
+            self.assertEqual(recipe.ingredients.count(), 1)
+        self.assertEqual(Tag.objects.filter(name='Dinner').count(), 1)
+        self.assertEqual(Ingredient.objects.filter(name='Salt').count(), 1)
+
+    def test_bulk_create_atomic_rejects_batch(self):
+        """Test an invalid recipe rejects the whole batch by default."""
+        payload = self._payload(2)
+        del payload[1]['title']
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            res.data[0]['status'],
+            status.HTTP_424_FAILED_DEPENDENCY
+        )
+        self.assertIn('title', res.data[1]['errors'])
+        self.assertFalse(Recipe.objects.filter(user=self.user).exists())
+
+    def test_bulk_create_partial_success(self):
+        """Test valid recipes are created when atomic is disabled."""
+        payload = self._payload(2)
+        del payload[0]['title']
+        url = f'{BULK_URL}?atomic=0'
+
+        res = self.client.post(url, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(res.data[0]['status'], status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[1]['status'], status.HTTP_201_CREATED)
+        recipe = Recipe.objects.get(user=self.user)
+        self.assertEqual(res.data[1]['data']['id'], recipe.id)
+
+    def test_bulk_create_invalid_atomic(self):
+        """Test an invalid atomic flag is rejected without creating."""
+        url = f'{BULK_URL}?atomic=maybe'
+
+        res = self.client.post(url, self._payload(1), format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('atomic', res.data)
+        self.assertFalse(Recipe.objects.filter(user=self.user).exists())
+
+    def test_bulk_create_requires_list(self):
+        """Test the bulk endpoint rejects a single object."""
+        res = self.client.post(BULK_URL, self._payload(1)[0], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_create_query_budget(self):
+        """Test the number of queries does not grow with the batch size."""
+        self.client.post(BULK_URL, self._payload(1), format='json')
+
+        small = count_queries(
+            self.client.post, BULK_URL, self._payload(1, 'a'), format='json'
+        )
+        large = count_queries(
+            self.client.post, BULK_URL, self._payload(20, 'b'), format='json'
+        )
+
+        self.assertEqual(small, large)
+
+    def _created(self, count, prefix='tag'):
+        res = self.client.post(
+            BULK_URL,
+            self._payload(count, prefix),
+            format='json'
+        )
+        return [result['data']['id'] for result in res.data]
+
+    def test_bulk_update_recipes(self):
+        """Test updating a list of recipes by id."""
+        first, second, third = self._created(3)
+        payload = [
+            {'id': second, 'title': 'Stew', 'tags': [{'name': 'Winter'}]},
+            {'id': first, 'price': '7.50', 'ingredients': []},
+        ]
+
+        res = self.client.patch(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        recipes = Recipe.objects.in_bulk([first, second, third])
+        for result, recipe_id in zip(res.data, (second, first)):
+            self.assertEqual(result['status'], status.HTTP_200_OK)
+            self.assertEqual(
+                result['data'],
+                RecipeDetailSerializer(recipes[recipe_id]).data
+            )
+        self.assertEqual(recipes[second].title, 'Stew')
+        self.assertEqual(
+            [tag.name for tag in recipes[second].tags.all()],
+            ['Winter']
+        )
+        self.assertEqual(recipes[second].ingredients.count(), 1)
+        self.assertEqual(recipes[first].price, Decimal('7.50'))
+        self.assertEqual(recipes[first].tags.count(), 2)
+        self.assertFalse(recipes[first].ingredients.exists())
+        self.assertEqual(recipes[third].title, 'recipe 2')
+
+    def test_bulk_update_invalid_ids(self):
+        """Test unknown, foreign and repeated ids fail their items."""
+        recipe_id, = self._created(1)
+        other = get_user_model().objects.create_user(
+            'other@example.com',
+            'simple123'
+        )
+        foreign = Recipe.objects.create(
+            user=other,
+            title='Theirs',
+            time_minutes=5,
+            price=Decimal('1.00')
+        )
+        payload = [
+            {'id': recipe_id, 'title': 'Mine'},
+            {'id': recipe_id, 'title': 'Again'},
+            {'id': foreign.id, 'title': 'Taken'},
+            {'title': 'No id'},
+        ]
+
+        res = self.client.patch(BULK_URL, payload, format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            [result['status'] for result in res.data],
+            [status.HTTP_424_FAILED_DEPENDENCY] + [
+                status.HTTP_400_BAD_REQUEST
+            ] * 3
+        )
+
+        res = self.client.patch(f'{BULK_URL}?atomic=0', payload, format='json')
+        self.assertEqual(res.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(res.data[0]['status'], status.HTTP_200_OK)
+        self.assertEqual(Recipe.objects.get(id=recipe_id).title, 'Mine')
+        foreign.refresh_from_db()
+        self.assertEqual(foreign.title, 'Theirs')
+
+    def test_bulk_update_query_budget(self):
+        """Test the number of update queries does not grow with the batch."""
+        ids = self._created(21)
+
+        def update(recipe_ids, prefix):
+            return count_queries(
+                self.client.patch,
+                BULK_URL,
+                [
+                    {'id': recipe_id, 'tags': [{'name': f'{prefix} {i}'}]}
+                    for i, recipe_id in enumerate(recipe_ids)
+                ],
+                format='json'
+            )
+
+        self.assertEqual(update(ids[:1], 'a'), update(ids[1:], 'b'))
+
+
+class ConcurrentRecipeCreateTests(TransactionTestCase):
+    """Test concurrent recipe creates share tags and ingredients."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'concurrent@example.com',
+            'simple123'
+        )
+
+    def _create(self, barrier, payload, statuses):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        try:
+            barrier.wait()
+            res = client.post(RECIPE_URL, payload, format='json')
+            statuses.append(res.status_code)
+        finally:
+            connection.close()
+
+    def test_concurrent_creates_no_duplicates(self):
+        """Test concurrent creates with the same names make no duplicates."""
+        workers = 8
+        barrier = threading.Barrier(workers)
+        statuses = []
+        threads = [
+            threading.Thread(target=self._create, args=(
+                barrier,
+                {
+                    'title': f'recipe {i}',
+                    'time_minutes': 10,
+                    'price': '5.00',
+                    'tags': [{'name': 'Vegan'}, {'name': 'vegan'}],
+                    'ingredients': [{'name': 'Salt'}, {'name': f'Herb {i}'}],
+                },
+                statuses
+            ))
+            for i in range(workers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(statuses, [status.HTTP_201_CREATED] * workers)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(
+            Ingredient.objects.filter(user=self.user, name='Salt').count(),
+            1
+        )
+        tag = Tag.objects.get(user=self.user)
+        self.assertEqual(tag.recipe_set.count(), workers)
+
+
+class RecipeQueryBudgetTests(TestCase):
+    """Test the number of queries does not grow with the number of rows."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'budget@example.com',
+            'simple123'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = sample_recipe(user=self.user)
+
+    def _add_recipes(self, count):
+        """Create recipes sharing tags and ingredients with self.recipe."""
+        offset = Recipe.objects.filter(user=self.user).count()
+        for i in range(offset, offset + count):
+            recipe = sample_recipe(user=self.user, title=f'recipe {i}')
+            tag = Tag.objects.create(user=self.user, name=f'tag {i}')
+            ingredient = Ingredient.objects.create(
+                user=self.user,
+                name=f'ingredient {i}'
+            )
+            recipe.tags.add(tag)
+            recipe.ingredients.add(ingredient)
+            self.recipe.tags.add(tag)
+            self.recipe.ingredients.add(ingredient)
+
+    def _assert_constant(self, func):
+        """Assert func runs the same number of queries as rows grow."""
+        func()
+        self._add_recipes(1)
+        small = count_queries(func)
+        self._add_recipes(10)
+        large = count_queries(func)
+
+        self.assertEqual(small, large)
+
+    def test_list_query_budget(self):
+        """Test listing recipes runs a fixed number of queries."""
+        self._assert_constant(lambda: self.client.get(RECIPE_URL))
+
+    def test_list_filtered_query_budget(self):
+        """Test filtering recipes runs a fixed number of queries."""
+        self._assert_constant(lambda: self.client.get(
+            RECIPE_URL,
+            {'tags': ','.join(str(t.id) for t in Tag.objects.all())}
+        ))
+
+    def test_facets_query_budget(self):
+        """Test facet counts run a fixed number of queries."""
+        self._assert_constant(lambda: self.client.get(FACETS_URL))
+        self._assert_constant(lambda: self.client.get(
+            FACETS_URL,
+            {'tags': ','.join(str(t.id) for t in Tag.objects.all())}
+        ))
+
+    def test_retrieve_query_budget(self):
+        """Test retrieving a recipe runs a fixed number of queries."""
+        self._assert_constant(
+            lambda: self.client.get(detial_url(self.recipe.id))
+        )
+
+    def test_create_query_budget(self):
+        """Test creating a recipe runs a fixed number of queries."""
+        payload = {
+            'title': 'Curry',
+            'time_minutes': 30,
+            'price': '2.50',
+            'tags': [{'name': 'Thai'}],
+            'ingredients': [{'name': 'Rice'}],
+        }
+        self._assert_constant(
+            lambda: self.client.post(RECIPE_URL, payload, format='json')
+        )
+
+    def test_create_query_budget_many_items(self):
+        """Test creating tags and ingredients is batched."""
+        def payload(count, prefix):
+            return {
+                'title': 'Stew',
+                'time_minutes': 30,
+                'price': '2.50',
+                'tags': [{'name': f'{prefix} tag {i}'} for i in range(count)],
+                'ingredients': [
+                    {'name': f'{prefix} ingredient {i}'} for i in range(count)
+                ],
+            }
+        Tag.objects.create(user=self.user, name='many tag 0')
+
+        single = count_queries(
+            self.client.post, RECIPE_URL, payload(1, 'single'), format='json'
+        )
+        many = count_queries(
+            self.client.post, RECIPE_URL, payload(30, 'many'), format='json'
+        )
+
+        self.assertEqual(single, many)
+        recipe = Recipe.objects.get(tags__name='many tag 0')
+        self.assertEqual(recipe.tags.count(), 30)
+        self.assertEqual(recipe.ingredients.count(), 30)
+        self.assertEqual(Tag.objects.filter(name='many tag 0').count(), 1)
+
+    def test_update_query_budget(self):
+        """Test updating a recipe runs a fixed number of queries."""
+        payload = {'title': 'New title', 'tags': [{'name': 'Lunch'}]}
+        self._assert_constant(lambda: self.client.patch(
+            detial_url(self.recipe.id), payload, format='json'
+        ))
+
+    def test_delete_query_budget(self):
+        """Test deleting a recipe runs a fixed number of queries."""
+        def delete():
+            recipe = sample_recipe(user=self.user)
+            self.client.delete(detial_url(recipe.id))
+
+        self._assert_constant(delete)
+
 
 class ImageUploadTests(TestCase):
     """"Test for the image upload API"""
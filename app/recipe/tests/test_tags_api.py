@@ -11,6 +11,7 @@ from rest_framework import status
 from rest_framework.test import APIClient
 
 from core.models import Tag, Recipe
+from recipe.filters import trigram_enabled
 from recipe.serializers import TagSerializer
 
 TAGS_URL = reverse('recipe:tag-list')
@@ -79,6 +80,38 @@ class PrivateTagsTests(TestCase):
         tag.refresh_from_db()
         self.assertEqual(tag.name, payload['name'])
 
+    def test_update_tag_duplicate_name(self):
+        """Test renaming a tag to an existing name is rejected."""
+        Tag.objects.create(user=self.user, name='Dessert')
+        tag = Tag.objects.create(user=self.user, name='After dinner')
+
+        res = self.client.patch(detial_url(tag.id), {'name': 'dessert'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        tag.refresh_from_db()
+        self.assertEqual(tag.name, 'After dinner')
+
+    def test_long_tag_name_rejected(self):
+        """Test names longer than the limit are rejected, not a 500."""
+        tag = Tag.objects.create(user=self.user, name='Dinner')
+        name = 'ß' * 256
+
+        res = self.client.patch(detial_url(tag.id), {'name': name})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.post(
+            reverse('recipe:recipe-list'),
+            {
+                'title': 'Soup',
+                'time_minutes': 10,
+                'price': '2.00',
+                'tags': [{'name': name}],
+            },
+            format='json'
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Recipe.objects.exists())
+
     def test_delete_tag(self):
         """Test deleting a tag."""
         tag = Tag.objects.create(user=self.user, name='Breakfast')
@@ -132,4 +165,112 @@ class PrivateTagsTests(TestCase):
 
         res = self.client.get(TAGS_URL, {'assigned_only': 1})
 
-        self.assertEqual(len(res.data), 1)
\ No newline at end of file
+        self.assertEqual(len(res.data), 1)
+
+    def test_tags_with_recipe_count(self):
+        """Test listing tags with the number of recipes using them."""
+        tag1 = Tag.objects.create(user=self.user, name='Vegan')
+        tag2 = Tag.objects.create(user=self.user, name='Dinner')
+        Tag.objects.create(user=self.user, name='Unused')
+        self._recipe_with_tags(tag1, tag2)
+        self._recipe_with_tags(tag1)
+
+        res = self.client.get(TAGS_URL, {'recipe_count': 1})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(t['name'], t['recipe_count']) for t in res.data],
+            [('Vegan', 2), ('Unused', 0), ('Dinner', 1)]
+        )
+        res = self.client.get(TAGS_URL)
+        self.assertNotIn('recipe_count', res.data[0])
+
+    def test_assigned_only_with_recipe_count(self):
+        """Test assigned_only is answered from the recipe count."""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        Tag.objects.create(user=self.user, name='Unused')
+        self._recipe_with_tags(tag)
+        self._recipe_with_tags(tag)
+
+        with self.assertNumQueries(1):
+            res = self.client.get(
+                TAGS_URL,
+                {'assigned_only': 1, 'recipe_count': 1}
+            )
+
+        self.assertEqual(res.data, [
+            {'id': tag.id, 'name': 'Vegan', 'recipe_count': 2}
+        ])
+
+    def test_tags_sparse_fields(self):
+        """Test ?fields= limits the tag fields."""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        self._recipe_with_tags(tag)
+
+        res = self.client.get(
+            TAGS_URL,
+            {'fields': 'name,recipe_count', 'recipe_count': 1}
+        )
+
+        self.assertEqual(res.data, [{'name': 'Vegan', 'recipe_count': 1}])
+
+    def _recipe_with_tags(self, *tags):
+        recipe = Recipe.objects.create(
+            user=self.user,
+            title='Recipe',
+            time_minutes=5,
+            price=Decimal('5.30')
+        )
+        recipe.tags.add(*tags)
+        return recipe
+
+    def test_autocomplete_ranking(self):
+        """Test exact, then prefix matches ordered by usage."""
+        vegan = Tag.objects.create(user=self.user, name='Vegan')
+        vegetarian = Tag.objects.create(user=self.user, name='Vegetarian')
+        veg = Tag.objects.create(user=self.user, name='VEG')
+        Tag.objects.create(user=self.user, name='Dessert')
+        self._recipe_with_tags(vegetarian)
+        self._recipe_with_tags(vegetarian, vegan)
+        self._recipe_with_tags(vegetarian)
+
+        res = self.client.get(TAGS_URL, {'q': 'veg'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        names = [tag['name'] for tag in res.data]
+        self.assertEqual(names[:3], [veg.name, vegetarian.name, vegan.name])
+        self.assertNotIn('Dessert', names)
+
+    def test_autocomplete_limit(self):
+        """Test autocomplete results are capped."""
+        Tag.objects.bulk_create(
+            Tag(user=self.user, name=f'Tag {i}') for i in range(60)
+        )
+
+        res = self.client.get(TAGS_URL, {'q': 'tag'})
+        self.assertEqual(len(res.data), 10)
+
+        res = self.client.get(TAGS_URL, {'q': 'tag', 'limit': 1000})
+        self.assertEqual(len(res.data), 50)
+
+        res = self.client.get(TAGS_URL, {'q': 'tag', 'limit': 'all'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_autocomplete_limited_to_user(self):
+        """Test autocomplete only matches the user's tags."""
+        user2 = create_user(email='user2@example.com')
+        Tag.objects.create(user=user2, name='Breakfast')
+
+        res = self.client.get(TAGS_URL, {'q': 'break'})
+
+        self.assertEqual(res.data, [])
+
+    def test_autocomplete_fuzzy(self):
+        """Test misspelled terms match similar names."""
+        if not trigram_enabled():
+            self.skipTest('pg_trgm is not installed')
+        tag = Tag.objects.create(user=self.user, name='Breakfast')
+
+        res = self.client.get(TAGS_URL, {'q': 'brekfast'})
+
+        self.assertEqual([t['id'] for t in res.data], [tag.id])
@@ -0,0 +1,122 @@
+"""
+Tests for the values list serialization path.
+"""
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tag
+from recipe import serializers
+from recipe.values import ValuesRepresentation
+from recipe.views import ValuesListMixin
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+
+
+class ValuesListTests(TestCase):
+    """Test the values path renders exactly the serializer output."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'values@example.com',
+            'simple123'
+        )
+        self.client.force_authenticate(self.user)
+        tags = [
+            Tag.objects.create(user=self.user, name=name)
+            for name in ('Vegan', 'Dinner', 'Quick')
+        ]
+        ingredients = [
+            Ingredient.objects.create(user=self.user, name=name)
+            for name in ('Rice', 'Beans', 'Lime')
+        ]
+        Tag.objects.create(user=self.user, name='Unused')
+        for i in range(12):
+            recipe = Recipe.objects.create(
+                user=self.user,
+                title=f'Rice bowl {i}',
+                description='Served warm.',
+                time_minutes=i,
+                price=Decimal('1.05') * i,
+                link='' if i % 2 else f'https://example.com/{i}'
+            )
+            recipe.tags.add(*tags[i % 3:])
+            recipe.ingredients.add(*ingredients[:i % 4])
+
+    def _assert_same(self, url, params=None):
+        """Assert the values path and serializers return the same bytes."""
+        cache.clear()
+        with patch.object(
+            ValuesRepresentation,
+            'represent',
+            autospec=True,
+            side_effect=ValuesRepresentation.represent
+        ) as represent:
+            fast = self.client.get(url, params)
+        represent.assert_called_once()
+        cache.clear()
+        with patch.object(ValuesListMixin, 'values_list', False):
+            slow = self.client.get(url, params)
+
+        self.assertEqual(fast.status_code, status.HTTP_200_OK)
+        self.assertEqual(fast.content, slow.content)
+        return fast
+
+    def test_recipe_list_matches(self):
+        """Test recipe list pages match the serializer output."""
+        res = self._assert_same(RECIPE_URL, {'page_size': 5})
+        self.assertEqual(len(res.data['results']), 5)
+
+        self._assert_same(res.data['next'])
+
+    def test_recipe_list_variants_match(self):
+        """Test filtered, searched and sparse recipe lists match."""
+        tag = Tag.objects.get(name='Quick')
+        for params in (
+            {'tags': tag.id},
+            {'search': 'rice', 'page_size': 4},
+            {'fields': 'id,title,price,tags'},
+            {'fields': 'link'},
+        ):
+            self._assert_same(RECIPE_URL, params)
+
+    def test_attr_lists_match(self):
+        """Test tag and ingredient lists match the serializer output."""
+        for url in (TAGS_URL, INGREDIENTS_URL):
+            for params in (
+                {},
+                {'assigned_only': 1},
+                {'recipe_count': 1},
+                {'q': 'r', 'recipe_count': 1},
+                {'fields': 'name'},
+            ):
+                self._assert_same(url, params)
+
+    def test_recipe_list_queries(self):
+        """Test a recipe page is read with a query per relation."""
+        self.client.get(RECIPE_URL)
+        cache.clear()
+
+        with self.assertNumQueries(3):
+            self.client.get(RECIPE_URL)
+
+    def test_unsupported_serializer(self):
+        """Test serializers with unsupported fields are not compiled."""
+        self.assertIsNone(ValuesRepresentation.compile(
+            serializers.RecipeDetailSerializer(),
+            Recipe
+        ))
+        self.assertIsNotNone(ValuesRepresentation.compile(
+            serializers.RecipeSerializer(many=True),
+            Recipe
+        ))
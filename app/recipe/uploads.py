@@ -0,0 +1,73 @@
+"""
+Streaming upload handling for recipe images.
+"""
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.http.multipartparser import (
+    MultiPartParser as DjangoMultiPartParser,
+    MultiPartParserError,
+)
+from rest_framework import status
+from rest_framework.exceptions import (
+    APIException,
+    ParseError,
+    UnsupportedMediaType,
+)
+from rest_framework.parsers import DataAndFiles, MultiPartParser
+
+
+class RequestEntityTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'Upload is too large.'
+    default_code = 'too_large'
+
+
+class ImageUploadHandler(TemporaryFileUploadHandler):
+    """
+    Stream uploads to a temporary file in fixed chunks, rejecting
+    oversized bodies and unexpected content types before reading them.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.chunk_size = settings.RECIPE_IMAGE_UPLOAD_CHUNK_SIZE
+        self.max_size = settings.RECIPE_IMAGE_MAX_UPLOAD_SIZE
+        self.received = 0
+
+    def handle_raw_input(self, input_data, META, content_length, boundary,
+                         encoding=None):
+        if content_length > self.max_size:
+            raise RequestEntityTooLarge()
+
+    def new_file(self, field_name, file_name, content_type, *args, **kwargs):
+        if content_type not in settings.RECIPE_IMAGE_CONTENT_TYPES:
+            raise UnsupportedMediaType(content_type)
+        self.received = 0
+        super().new_file(field_name, file_name, content_type, *args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > self.max_size:
+            self.upload_interrupted()
+            raise RequestEntityTooLarge()
+
+        return super().receive_data_chunk(raw_data, start)
+
+
+class ImageUploadParser(MultiPartParser):
+    """Multipart parser that streams files through ImageUploadHandler."""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        request = parser_context['request']
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        meta = request.META.copy()
+        meta['CONTENT_TYPE'] = media_type
+        handlers = [ImageUploadHandler(request)]
+
+        try:
+            parser = DjangoMultiPartParser(meta, stream, handlers, encoding)
+            data, files = parser.parse()
+            return DataAndFiles(data, files)
+        except MultiPartParserError as exc:
+            raise ParseError('Multipart form parse error - %s' % str(exc))
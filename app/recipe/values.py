@@ -0,0 +1,126 @@
+"""
+Read-only list serialization straight from .values() rows.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+# Fields whose representation of a database value is the value itself.
+PLAIN_FIELDS = (serializers.IntegerField, serializers.CharField)
+# Fields rendered with their own to_representation, without get_attribute.
+CONVERTED_FIELDS = (
+    serializers.BooleanField,
+    serializers.DecimalField,
+    serializers.FloatField,
+    serializers.URLField,
+)
+
+
+class ValuesRepresentation:
+    """
+    Render the readable fields of a model serializer from value rows,
+    matching the serializer output, with nested many-to-many
+    serializers filled from one grouped query per relation.
+    """
+
+    def __init__(self, model, entries):
+        self.model = model
+        self.entries = entries
+
+    @classmethod
+    def compile(cls, serializer, model):
+        """Return the representation of serializer, or None if unsupported."""
+        if isinstance(serializer, serializers.ListSerializer):
+            serializer = serializer.child
+
+        entries = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if field.source == '*' or '.' in field.source:
+                return None
+
+            if type(field) in PLAIN_FIELDS:
+                entries.append((name, field.source, None, None))
+            elif type(field) in CONVERTED_FIELDS:
+                entries.append(
+                    (name, field.source, field.to_representation, None)
+                )
+            elif isinstance(field, serializers.ListSerializer):
+                try:
+                    related = model._meta.get_field(field.source)
+                except FieldDoesNotExist:
+                    return None
+                if not related.many_to_many:
+                    return None
+                child = cls.compile(field.child, related.related_model)
+                if child is None or child.nested:
+                    return None
+                entries.append((name, related, None, child))
+            else:
+                return None
+
+        return cls(model, entries)
+
+    @property
+    def nested(self):
+        return [entry for entry in self.entries if entry[3] is not None]
+
+    @property
+    def columns(self):
+        """Return the value names to select for the rows."""
+        names = [self.model._meta.pk.attname] if self.nested else []
+        names += [
+            source for _, source, _, child in self.entries if child is None
+        ]
+
+        return list(dict.fromkeys(names))
+
+    def _represent_row(self, row, related):
+        item = {}
+        for name, source, convert, child in self.entries:
+            if child is not None:
+                item[name] = related[name].get(
+                    row[self.model._meta.pk.attname], []
+                )
+                continue
+
+            value = row[source]
+            if value is not None and convert is not None:
+                value = convert(value)
+            item[name] = value
+
+        return item
+
+    def _related_items(self, related, child, ids):
+        """Return the represented related items grouped by row id."""
+        query_name = related.related_query_name()
+        rows = related.related_model.objects.filter(
+            **{f'{query_name}__in': ids}
+        ).order_by('pk').values(query_name, *child.columns)
+
+        grouped = {}
+        for row in rows:
+            grouped.setdefault(row[query_name], []).append(
+                child._represent_row(row, {})
+            )
+
+        return grouped
+
+    def fetch_related(self, rows):
+        """Return the represented nested items by field name and row id."""
+        if not rows or not self.nested:
+            return {}
+
+        ids = [row[self.model._meta.pk.attname] for row in rows]
+        return {
+            name: self._related_items(field, child, ids)
+            for name, field, _, child in self.nested
+        }
+
+    def represent(self, rows, related=None):
+        """Return the serialized list of value rows."""
+        rows = list(rows)
+        if related is None:
+            related = self.fetch_related(rows)
+
+        return [self._represent_row(row, related) for row in rows]
@@ -7,40 +7,241 @@ from drf_spectacular.utils import (
     OpenApiParameter,
     OpenApiTypes
 )
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch
+from django.shortcuts import get_object_or_404
+from django.utils.http import parse_etags
 from rest_framework import viewsets, mixins, status
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.fields import BooleanField
+from rest_framework.pagination import CursorPagination
 from core.models import (
     Recipe,
     Tag,
     Ingredient
 )
 from recipe import serializers
+from recipe.cache import (
+    get_cached_response,
+    object_etag,
+    response_cache_key,
+    response_etag,
+    set_cached_response
+)
+from recipe.filters import (
+    annotate_recipe_count,
+    autocomplete,
+    facet_counts,
+    filter_assigned,
+    filter_recipes_by,
+    search_recipes,
+)
+from recipe.images import enqueue_image
+from recipe.pagination import RecipeCursorPagination
+from recipe.signals import invalidate_user_cache
+from recipe.uploads import ImageUploadParser
+from recipe.values import ValuesRepresentation
+from user.authentication import (
+    CachedTokenAuthentication,
+    SignedTokenAuthentication
+)
 
-@extend_schema_view(
-    list=extend_schema(
-        parameters=[
-            OpenApiParameter(
-                'tags',
-                OpenApiTypes.STR,
-                description='Comma seprated list of IDs to filter.'
-            ),
-            OpenApiParameter(
-                'ingredients',
-                OpenApiTypes.STR,
-                description='Comma seprated list of IDs to filter.'
+
+class CachedListMixin:
+    """Serve list responses from the per-user response cache."""
+
+    def cached_response(self, request, prefix, handler, *args, **kwargs):
+        """Return the cached response data, else call and cache handler."""
+        if not settings.RECIPE_CACHE_ENABLED:
+            return handler(request, *args, **kwargs)
+
+        key = response_cache_key(prefix, request)
+        data = get_cached_response(key)
+        if data is not None:
+            return Response(data)
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            set_cached_response(key, response.data)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(
+            request, self.basename, super().list, *args, **kwargs
+        )
+
+
+class ValuesListMixin:
+    """Serve read-only list output from .values() rows when supported."""
+    values_list = True
+
+    def list(self, request, *args, **kwargs):
+        representation = None
+        if self.values_list:
+            representation = ValuesRepresentation.compile(
+                self.get_serializer(many=True),
+                self.queryset.model
             )
-        ]
+        if representation is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        columns = representation.columns
+        if isinstance(self.paginator, CursorPagination):
+            ordering = self.paginator.get_ordering(request, queryset, self)
+            columns += [field.lstrip('-') for field in ordering]
+        rows = queryset.prefetch_related(None).values(
+            *dict.fromkeys(columns)
+        )
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(
+                representation.represent(page)
+            )
+
+        return Response(representation.represent(rows))
+
+
+class ConditionalMixin:
+    """
+    Answer conditional requests. Lists are tagged with the user data
+    version, single objects with the time their own row last changed.
+    """
+
+    def get_etag(self, request):
+        """Return the ETag of the list, or None without a shared cache."""
+        if not settings.RECIPE_CACHE_ENABLED:
+            return None
+
+        return response_etag(self.basename, request)
+
+    def get_object_etag(self, request, lock=False):
+        """Return the ETag of the requested object, raising 404 if absent."""
+        queryset = self.filter_queryset(self.get_queryset())
+        queryset = queryset.prefetch_related(None)
+        if lock:
+            queryset = queryset.select_for_update()
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        updated = get_object_or_404(
+            queryset.values_list('updated', flat=True),
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        )
+
+        return object_etag(self.basename, request, updated)
+
+    def conditional_get(self, handler, request, *args, **kwargs):
+        """Return 304 if the client copy is current, else call handler."""
+        if (self.lookup_url_kwarg or self.lookup_field) in self.kwargs:
+            etag = self.get_object_etag(request)
+        else:
+            etag = self.get_etag(request)
+        if etag is None:
+            return handler(request, *args, **kwargs)
+
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match is not None:
+            etags = parse_etags(if_none_match)
+            if {'*', etag, f'W/{etag}'} & set(etags):
+                return Response(
+                    status=status.HTTP_304_NOT_MODIFIED,
+                    headers={'ETag': etag}
+                )
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            response['ETag'] = etag
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_get(super().list, request, *args, **kwargs)
+
+    def update(self, request, *args, **kwargs):
+        if_match = request.META.get('HTTP_IF_MATCH')
+        with transaction.atomic():
+            # Lock the row so no other write lands between the check, this
+            # write and the ETag returned with it.
+            etag = self.get_object_etag(request, lock=True)
+            if if_match is not None:
+                etags = parse_etags(if_match)
+                if '*' not in etags and etag not in etags:
+                    return Response(
+                        status=status.HTTP_412_PRECONDITION_FAILED
+                    )
+
+            response = super().update(request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                response['ETag'] = self.get_object_etag(request)
+
+        return response
+
+
+FIELDS_PARAMETER = OpenApiParameter(
+    'fields',
+    OpenApiTypes.STR,
+    description='Comma separated list of fields to include in the response.'
+)
+
+BULK_ATOMIC_PARAMETER = OpenApiParameter(
+    'atomic',
+    OpenApiTypes.BOOL,
+    description='Reject the whole batch if any recipe is invalid.'
+)
+
+RECIPE_FILTER_PARAMETERS = [
+    OpenApiParameter(
+        'tags',
+        OpenApiTypes.STR,
+        description='Comma seprated list of IDs to filter.'
+    ),
+    OpenApiParameter(
+        'ingredients',
+        OpenApiTypes.STR,
+        description='Comma seprated list of IDs to filter.'
+    ),
+    OpenApiParameter(
+        'match',
+        OpenApiTypes.STR, enum=['any', 'all'],
+        description='Match recipes having any or all of the IDs.'
+    ),
+    OpenApiParameter(
+        'search',
+        OpenApiTypes.STR,
+        description=(
+            'Full-text search over title and description, '
+            'ordered by relevance.'
+        )
     )
+]
+
+
+@extend_schema_view(
+    list=extend_schema(
+        parameters=RECIPE_FILTER_PARAMETERS + [FIELDS_PARAMETER]
+    ),
+    retrieve=extend_schema(parameters=[FIELDS_PARAMETER])
 )
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(
+    ConditionalMixin,
+    CachedListMixin,
+    ValuesListMixin,
+    viewsets.ModelViewSet
+):
     """View for manage recipe API."""
     serializer_class = serializers.RecipeDetailSerializer
     queryset = Recipe.objects.all()
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [
+        CachedTokenAuthentication,
+        SignedTokenAuthentication
+    ]
     permission_classes = [IsAuthenticated]
+    pagination_class = RecipeCursorPagination
+    bulk_max_size = 1000
+    filter_params = ('tags', 'ingredients', 'search')
 
     def _params_to_ints(self, qs):
         """Convert a list of strings to integers"""
@@ -51,16 +252,37 @@ class RecipeViewSet(viewsets.ModelViewSet):
         # return self.queryset.filter(user=self.request.user).order_by('-id')
         tags = self.request.query_params.get('tags')
         ingredients = self.request.query_params.get('ingredients')
+        match_all = self.request.query_params.get('match') == 'all'
+        search = self.request.query_params.get('search')
         queryset = self.queryset
+        if search:
+            queryset = search_recipes(queryset, search)
+
         if tags:
             tags_ids = self._params_to_ints(tags)
-            queryset = queryset.filter(tags__id__in=tags_ids)
+            queryset = filter_recipes_by(queryset, 'tags', tags_ids, match_all)
 
         if ingredients:
             ingredients_ids = self._params_to_ints(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingredients_ids)
+            queryset = filter_recipes_by(
+                queryset, 'ingredients', ingredients_ids, match_all
+            )
+
+        queryset = queryset.filter(user=self.request.user).order_by('-id')
+        if self.action not in ('destroy', 'upload_image', 'facets'):
+            fields = serializers.requested_fields(self.request)
+            queryset = queryset.prefetch_related(*[
+                self._ordered_prefetch(field)
+                for field in ('tags', 'ingredients')
+                if fields is None or field in fields
+            ])
+
+        return queryset
 
-        return queryset.filter(user=self.request.user).order_by('-id').distinct()
+    def _ordered_prefetch(self, field):
+        """Prefetch related items by id, the order of the values path."""
+        model = Recipe._meta.get_field(field).related_model
+        return Prefetch(field, queryset=model.objects.order_by('id'))
 
     def get_serializer_class(self):
         """Return the serializer class for request."""
@@ -71,11 +293,179 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
         return self.serializer_class
 
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_get(
+            super().retrieve, request, *args, **kwargs
+        )
+
     def perform_create(self, serializer):
         """Create a new recipe"""
         serializer.save(user=self.request.user)
 
-    @action(methods=['POST'], detail=True, url_path='upload-image')
+    def _bulk_atomic(self, request):
+        """Check the body of a bulk request and return its atomic flag."""
+        if not isinstance(request.data, list):
+            raise ValidationError({'detail': 'Expected a list of recipes.'})
+        if len(request.data) > self.bulk_max_size:
+            raise ValidationError(
+                {'detail': f'At most {self.bulk_max_size} recipes allowed.'}
+            )
+
+        try:
+            return BooleanField().to_internal_value(
+                request.query_params.get('atomic', True)
+            )
+        except ValidationError as exc:
+            raise ValidationError({'atomic': exc.detail})
+
+    def _bulk_rejected(self, errors):
+        """Return the results of an atomic batch with invalid recipes."""
+        results = [
+            {'status': status.HTTP_424_FAILED_DEPENDENCY, 'errors': {}}
+            if error is None else
+            {'status': status.HTTP_400_BAD_REQUEST, 'errors': error}
+            for error in errors
+        ]
+        return Response(results, status=status.HTTP_400_BAD_REQUEST)
+
+    def _bulk_results(self, recipes, errors, success_status):
+        """Return the per-item results of a written batch."""
+        invalidate_user_cache(self.request.user.id)
+        queryset = Recipe.objects.filter(
+            id__in=[recipe.id for recipe in recipes]
+        ).prefetch_related(
+            self._ordered_prefetch('tags'),
+            self._ordered_prefetch('ingredients')
+        )
+        data = {
+            item['id']: item
+            for item in self.get_serializer(queryset, many=True).data
+        }
+        written = iter(recipes)
+
+        results = [
+            {'status': success_status, 'data': data[next(written).id]}
+            if error is None else
+            {'status': status.HTTP_400_BAD_REQUEST, 'errors': error}
+            for error in errors
+        ]
+        if any(errors):
+            return Response(results, status=status.HTTP_207_MULTI_STATUS)
+
+        return Response(results, status=success_status)
+
+    @extend_schema(
+        request=serializers.RecipeDetailSerializer(many=True),
+        parameters=[BULK_ATOMIC_PARAMETER]
+    )
+    @action(methods=['POST'], detail=False, url_path='bulk')
+    def bulk(self, request):
+        """Create a list of recipes in one transaction."""
+        atomic = self._bulk_atomic(request)
+        items = [self.get_serializer(data=data) for data in request.data]
+        errors = [None if item.is_valid() else item.errors for item in items]
+        if atomic and any(errors):
+            return self._bulk_rejected(errors)
+
+        recipes = self.get_serializer(many=True).create([
+            dict(item.validated_data, user=request.user)
+            for item, error in zip(items, errors) if error is None
+        ])
+
+        return self._bulk_results(recipes, errors, status.HTTP_201_CREATED)
+
+    @extend_schema(
+        request=serializers.RecipeDetailSerializer(many=True, partial=True),
+        parameters=[BULK_ATOMIC_PARAMETER]
+    )
+    @bulk.mapping.patch
+    def bulk_update(self, request):
+        """Update a list of recipes, each identified by its id."""
+        atomic = self._bulk_atomic(request)
+        ids = [
+            data.get('id') if isinstance(data, dict) else None
+            for data in request.data
+        ]
+        with transaction.atomic():
+            recipes = Recipe.objects.select_for_update().filter(
+                user=request.user,
+                id__in=[
+                    recipe_id for recipe_id in ids
+                    if type(recipe_id) is int
+                ]
+            ).in_bulk()
+
+            items = []
+            errors = []
+            seen = set()
+            for data, recipe_id in zip(request.data, ids):
+                if type(recipe_id) is not int:
+                    error = 'A valid integer is required.'
+                elif recipe_id in seen:
+                    error = 'Recipe listed more than once.'
+                elif recipe_id not in recipes:
+                    error = 'Not found.'
+                else:
+                    error = None
+                    seen.add(recipe_id)
+                if error is not None:
+                    items.append(None)
+                    errors.append({'id': [error]})
+                    continue
+
+                item = self.get_serializer(
+                    recipes[recipe_id],
+                    data=data,
+                    partial=True
+                )
+                items.append(item)
+                errors.append(None if item.is_valid() else item.errors)
+
+            if atomic and any(errors):
+                return self._bulk_rejected(errors)
+
+            valid = [
+                item for item, error in zip(items, errors) if error is None
+            ]
+            updated = self.get_serializer(many=True).update(
+                [item.instance for item in valid],
+                [item.validated_data for item in valid]
+            )
+
+        return self._bulk_results(updated, errors, status.HTTP_200_OK)
+
+    @extend_schema(
+        parameters=RECIPE_FILTER_PARAMETERS,
+        responses=serializers.RecipeFacetsSerializer
+    )
+    @action(methods=['GET'], detail=False, url_path='facets')
+    def facets(self, request):
+        """Count the filtered recipes per tag and per ingredient."""
+        return self.conditional_get(
+            self.cached_response,
+            request,
+            f'{self.basename}-facets',
+            self.get_facets
+        )
+
+    def get_facets(self, request):
+        """Return the facet counts of the user's recipes."""
+        recipes = None
+        if any(request.query_params.get(p) for p in self.filter_params):
+            recipes = self.get_queryset()
+
+        facets = {'tags': [], 'ingredients': []}
+        for kind, item_id, name, count in facet_counts(request.user, recipes):
+            facets[kind].append({'id': item_id, 'name': name, 'count': count})
+
+        return Response(serializers.RecipeFacetsSerializer(facets).data)
+
+    @action(
+        methods=['POST'],
+        detail=True,
+        url_path='upload-image',
+        parser_classes=[ImageUploadParser]
+    )
     def upload_image(self, request, pk=None):
         """Upload an image to recipe"""
         recipe = self.get_object()
@@ -83,6 +473,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
         if serializer.is_valid():
             serializer.save()
+            enqueue_image(recipe)
             return Response(serializer.data, status=status.HTTP_200_OK)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -94,37 +485,117 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 'assigned_only',
                 OpenApiTypes.INT, enum=[0,1],
                 description='Filter by items assigned to recipes.'
-            )
+            ),
+            OpenApiParameter(
+                'recipe_count',
+                OpenApiTypes.INT, enum=[0, 1],
+                description='Include the number of recipes using each item.'
+            ),
+            OpenApiParameter(
+                'q',
+                OpenApiTypes.STR,
+                description=(
+                    'Autocomplete: names starting with or similar to q, '
+                    'best matches and most used first.'
+                )
+            ),
+            OpenApiParameter(
+                'limit',
+                OpenApiTypes.INT,
+                description=(
+                    'Maximum autocomplete results (default 10, max 50).'
+                )
+            ),
+            FIELDS_PARAMETER
         ]
     )
 )
 class BaseRecipeAttrViewSet(
+    ConditionalMixin,
+    CachedListMixin,
+    ValuesListMixin,
     mixins.DestroyModelMixin,
     mixins.UpdateModelMixin,
     mixins.ListModelMixin,
     viewsets.GenericViewSet
 ):
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [
+        CachedTokenAuthentication,
+        SignedTokenAuthentication
+    ]
     permission_classes = [IsAuthenticated]
 
+    def _with_count(self):
+        """Return whether the list should include recipe counts."""
+        return self.action == 'list' and bool(
+            int(self.request.query_params.get('recipe_count', 0))
+        )
+
     def get_queryset(self):
         """filter queryset to authenticated user."""
         assigned_only = bool(
             int(self.request.query_params.get('assigned_only', 0))
         )
         queryset = self.queryset
-        if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)
+        if self._with_count():
+            queryset = annotate_recipe_count(queryset, self.recipe_field)
+            if assigned_only:
+                queryset = queryset.filter(recipe_count__gt=0)
+        elif assigned_only:
+            queryset = filter_assigned(queryset, self.recipe_field)
+
+        queryset = queryset.filter(user=self.request.user).order_by('-name')
+        term = self.request.query_params.get('q')
+        if term and self.action == 'list':
+            queryset = autocomplete(
+                queryset,
+                self.recipe_field,
+                term,
+                self._autocomplete_limit()
+            )
+
+        return queryset
+
+    def _autocomplete_limit(self):
+        """Return the requested autocomplete limit, capped by the server."""
+        limit = self.request.query_params.get('limit')
+        if limit is None:
+            return settings.AUTOCOMPLETE_LIMIT
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise ValidationError({'limit': ['A valid integer is required.']})
+
+        return max(1, min(limit, settings.AUTOCOMPLETE_MAX_LIMIT))
 
-        return queryset.filter(user=self.request.user).order_by('-name').distinct()
+    def get_serializer_class(self):
+        """Return the serializer class for request."""
+        if self._with_count():
+            return self.count_serializer_class
+
+        return self.serializer_class
+
+    def perform_update(self, serializer):
+        """Update the item, rejecting a name already used by the user."""
+        try:
+            with transaction.atomic():
+                serializer.save()
+        except IntegrityError:
+            raise ValidationError(
+                {'name': ['An item with this name already exists.']}
+            )
 
 
 class TagViewSet(BaseRecipeAttrViewSet):
     """Manage tags in the database."""
     serializer_class = serializers.TagSerializer
+    count_serializer_class = serializers.TagCountSerializer
     queryset = Tag.objects.all()
+    recipe_field = 'tags'
 
 class IngredentViewSet(BaseRecipeAttrViewSet):
     """Manage ingredients in the database."""
     serializer_class = serializers.IngredientSerializer
-    queryset = Ingredient.objects.all()
\ No newline at end of file
+    count_serializer_class = serializers.IngredientCountSerializer
+    queryset = Ingredient.objects.all()
+    recipe_field = 'ingredients'
\ No newline at end of file
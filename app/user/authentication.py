@@ -0,0 +1,194 @@
+"""
+Authentication classes for the APIs.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import (
+    BaseAuthentication,
+    TokenAuthentication,
+    get_authorization_header
+)
+from rest_framework.exceptions import AuthenticationFailed
+
+from user.tokens import read_access_token
+
+
+class TTLCache:
+    """A bounded, thread-safe LRU cache whose entries expire."""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the value for key or None if missing or expired."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self._data.pop(key, None)
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        """Store a value, evicting the least recently used if full."""
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_matching(self, predicate):
+        """Remove every entry whose value matches predicate."""
+        with self._lock:
+            keys = [
+                key for key, (_, value) in self._data.items()
+                if predicate(value)
+            ]
+            for key in keys:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Return the hit and miss counters and the current size."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._data),
+            }
+
+
+token_cache = TTLCache(
+    settings.TOKEN_CACHE_MAX_SIZE,
+    settings.TOKEN_CACHE_TTL
+)
+user_cache = TTLCache(
+    settings.TOKEN_CACHE_MAX_SIZE,
+    settings.TOKEN_CACHE_TTL
+)
+
+
+def _auth_version_key(user_id):
+    return f'user:auth:{user_id}'
+
+
+def get_auth_version(user_id):
+    """Return the credentials version of a user from the shared cache."""
+    key = _auth_version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock so an evicted counter never reuses a version.
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+
+    return version
+
+
+def bump_auth_version(user_id):
+    """Invalidate the cached credentials of a user in every process."""
+    try:
+        cache.incr(_auth_version_key(user_id))
+    except ValueError:
+        get_auth_version(user_id)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication with an in-process token to user cache. Hits
+    are only used while the user's credentials version is unchanged.
+    """
+
+    def authenticate_credentials(self, key):
+        if not settings.TOKEN_CACHE_ENABLED:
+            return super().authenticate_credentials(key)
+
+        cached = token_cache.get(key)
+        if cached is not None and cached[0] != get_auth_version(
+            cached[1].pk
+        ):
+            cached = None
+        if cached is None:
+            user, token = super().authenticate_credentials(key)
+            cached = (get_auth_version(user.pk), user, token)
+            token_cache.set(key, cached)
+
+        _, user, token = cached
+        # Requests may modify request.user, so never share the instance.
+        return copy.copy(user), token
+
+
+class SignedTokenAuthentication(BaseAuthentication):
+    """Authenticate short-lived signed access tokens.
+
+    Clients send `Authorization: Bearer <access token>`. The signature and
+    expiry are checked without database access. The user, whose token
+    generation revokes tokens, is loaded through an in-process cache
+    checked against the shared credentials version.
+    """
+    keyword = 'Bearer'
+
+    def _get_user(self, user_id):
+        if not settings.TOKEN_CACHE_ENABLED:
+            return get_user_model().objects.filter(pk=user_id).first()
+
+        # Read the version first, so a change committed while the user is
+        # loaded bumps it past the one stored with the entry.
+        version = get_auth_version(user_id)
+        cached = user_cache.get(user_id)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        user = get_user_model().objects.filter(pk=user_id).first()
+        if user is not None:
+            user_cache.set(user_id, (version, user))
+
+        return user
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+
+        if len(auth) != 2:
+            raise AuthenticationFailed(_('Invalid token header.'))
+
+        try:
+            payload = read_access_token(auth[1].decode())
+        except (signing.BadSignature, UnicodeError):
+            raise AuthenticationFailed(_('Invalid or expired token.'))
+
+        user = self._get_user(payload['uid'])
+        if user is None or user.token_generation != payload['gen']:
+            raise AuthenticationFailed(_('Invalid or expired token.'))
+        if not user.is_active:
+            raise AuthenticationFailed(_('User inactive or deleted.'))
+
+        return copy.copy(user), payload
+
+    def authenticate_header(self, request):
+        return self.keyword
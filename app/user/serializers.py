@@ -5,9 +5,13 @@ from django.contrib.auth import (
     get_user_model,
     authenticate
 )
+from django.utils import timezone
 from rest_framework import serializers
 from django.utils.translation import gettext as _
 
+from core.models import RefreshToken
+from user.tokens import revoke_tokens
+
 class UserSerializer(serializers.ModelSerializer):
     """Serializer for the user object."""
 
@@ -27,6 +31,7 @@ class UserSerializer(serializers.ModelSerializer):
 
         if password:
             user.set_password(password)
+            revoke_tokens(user)
             user.save()
 
         return user
@@ -38,6 +43,10 @@ class AuthTokenSerializer(serializers.Serializer):
         style={'input_type': 'password'},
         trim_whitespace=False
     )
+    token_type = serializers.ChoiceField(
+        choices=['db', 'signed'],
+        default='db'
+    )
 
     def validate(self, attrs):
         """Validate and authenticate the user."""
@@ -55,4 +64,28 @@ class AuthTokenSerializer(serializers.Serializer):
             raise serializers.ValidationError(msg, code='authorization')
 
         attrs['user'] = user
-        return attrs
\ No newline at end of file
+        return attrs
+
+class RefreshTokenSerializer(serializers.Serializer):
+    """Serializer exchanging a refresh token for new tokens."""
+    refresh = serializers.CharField()
+
+    def validate(self, attrs):
+        """Validate the refresh token is current and return its user."""
+        # Lock the token until the exchange commits, so a concurrent
+        # refresh with the same token finds it deleted.
+        token = RefreshToken.objects.select_related('user').select_for_update(
+            of=('self',)
+        ).filter(key=attrs.get('refresh')).first()
+
+        if (
+            token is None or
+            token.expires < timezone.now() or
+            token.generation != token.user.token_generation or
+            not token.user.is_active
+        ):
+            msg = _('Invalid or expired refresh token.')
+            raise serializers.ValidationError(msg, code='authorization')
+
+        attrs['token'] = token
+        return attrs
@@ -0,0 +1,31 @@
+"""
+Signal handlers keeping the token cache consistent.
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from user.authentication import bump_auth_version, token_cache, user_cache
+
+
+def invalidate_credentials(user_id):
+    """Bump the credentials version now and again once the write commits."""
+    bump_auth_version(user_id)
+    transaction.on_commit(lambda: bump_auth_version(user_id))
+
+
+@receiver(post_delete, sender=Token)
+def evict_deleted_token(sender, instance, **kwargs):
+    token_cache.delete(instance.key)
+    invalidate_credentials(instance.user_id)
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def evict_user_tokens(sender, instance, **kwargs):
+    """Drop cached tokens of a saved user, e.g. deactivated or new password."""
+    token_cache.delete_matching(lambda cached: cached[1].pk == instance.pk)
+    user_cache.delete(instance.pk)
+    invalidate_credentials(instance.pk)
@@ -0,0 +1,321 @@
+"""
+Tests for the cached token authentication.
+"""
+import threading
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import F
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import RefreshToken
+from user.authentication import (
+    TTLCache,
+    bump_auth_version,
+    token_cache,
+    user_cache
+)
+
+ME_URL = reverse('user:me')
+TOKEN_URL = reverse('user:token')
+REFRESH_URL = reverse('user:token-refresh')
+
+
+class TTLCacheTests(TestCase):
+    """Test the bounded TTL cache."""
+
+    def test_evicts_least_recently_used(self):
+        """Test the cache never grows past its maximum size."""
+        cache = TTLCache(max_size=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.stats()['size'], 2)
+
+    def test_entries_expire(self):
+        """Test entries are not returned after their TTL."""
+        cache = TTLCache(max_size=2, ttl=-1)
+        cache.set('a', 1)
+
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.stats()['misses'], 1)
+
+
+@override_settings(TOKEN_CACHE_ENABLED=True)
+class CachedTokenAuthenticationTests(TestCase):
+    """Test authenticating requests with cached tokens."""
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='token@example.com',
+            password='simple123',
+            name='Token'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_cached_token_skips_query(self):
+        """Test a repeated request is authenticated without queries."""
+        self.client.get(ME_URL)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+        self.assertEqual(token_cache.stats()['hits'], 1)
+        self.assertEqual(token_cache.stats()['misses'], 1)
+
+    def test_deleted_token_rejected(self):
+        """Test deleting a token invalidates the cache entry."""
+        self.client.get(ME_URL)
+        self.token.delete()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_rejected(self):
+        """Test deactivating a user invalidates the cache entry."""
+        self.client.get(ME_URL)
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_evicts_token(self):
+        """Test changing the password evicts the cached user."""
+        self.client.get(ME_URL)
+        self.client.patch(ME_URL, {'password': 'newpassword123'})
+
+        self.client.get(ME_URL)
+
+        self.assertEqual(token_cache.stats()['misses'], 2)
+
+    def test_token_deleted_in_other_process_rejected(self):
+        """Test a credentials version bumped elsewhere drops the entry."""
+        self.client.get(ME_URL)
+        # Another process deletes the token; only the shared version
+        # reaches this one.
+        Token.objects.filter(pk=self.token.pk)._raw_delete('default')
+        bump_auth_version(self.user.pk)
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(TOKEN_CACHE_ENABLED=False)
+    def test_token_not_cached_without_shared_cache(self):
+        """Test tokens are read from the database without a shared cache."""
+        self.client.get(ME_URL)
+
+        with self.assertNumQueries(1):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(token_cache.stats()['hits'], 0)
+
+
+@override_settings(TOKEN_CACHE_ENABLED=True)
+class SignedTokenAuthenticationTests(TestCase):
+    """Test signed access tokens and the refresh flow."""
+
+    def setUp(self):
+        user_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='signed@example.com',
+            password='simple123',
+            name='Signed'
+        )
+        self.client = APIClient()
+
+    def _login(self):
+        res = self.client.post(TOKEN_URL, {
+            'email': 'signed@example.com',
+            'password': 'simple123',
+            'token_type': 'signed',
+        })
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def test_signed_token_issued(self):
+        """Test requesting signed tokens returns access and refresh."""
+        tokens = self._login()
+
+        self.assertIn('access', tokens)
+        self.assertIn('refresh', tokens)
+        self.assertFalse(Token.objects.filter(user=self.user).exists())
+
+    def test_access_token_verified_without_queries(self):
+        """Test a cached user is authenticated without queries."""
+        tokens = self._login()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {tokens["access"]}'
+        )
+        self.client.get(ME_URL)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+
+    def test_tampered_access_token_rejected(self):
+        """Test a modified access token is rejected."""
+        tokens = self._login()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {tokens["access"]}x'
+        )
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(ACCESS_TOKEN_LIFETIME=-1)
+    def test_expired_access_token_rejected(self):
+        """Test an expired access token is rejected."""
+        tokens = self._login()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {tokens["access"]}'
+        )
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_revoked_in_other_process_rejected(self):
+        """Test tokens revoked in another process are rejected here."""
+        tokens = self._login()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {tokens["access"]}'
+        )
+        self.client.get(ME_URL)
+        # Another process revokes the tokens; only the shared version
+        # reaches this one.
+        get_user_model().objects.filter(pk=self.user.pk).update(
+            token_generation=F('token_generation') + 1
+        )
+        bump_auth_version(self.user.pk)
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(TOKEN_CACHE_ENABLED=False)
+    def test_revoked_without_shared_cache_rejected(self):
+        """Test the token generation is read on every request."""
+        tokens = self._login()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {tokens["access"]}'
+        )
+        self.client.get(ME_URL)
+        get_user_model().objects.filter(pk=self.user.pk).update(
+            token_generation=F('token_generation') + 1
+        )
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_refresh_rotates_tokens(self):
+        """Test a refresh token is exchanged once for new tokens."""
+        tokens = self._login()
+
+        res = self.client.post(REFRESH_URL, {'refresh': tokens['refresh']})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res.data['refresh'], tokens['refresh'])
+        res = self.client.post(REFRESH_URL, {'refresh': tokens['refresh']})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_login_deletes_expired_refresh_tokens(self):
+        """Test issuing tokens deletes the user's expired refresh tokens."""
+        old = self._login()
+        live = self._login()
+        RefreshToken.objects.filter(key=old['refresh']).update(
+            expires=timezone.now() - timedelta(seconds=1)
+        )
+
+        new = self._login()
+
+        self.assertEqual(
+            set(RefreshToken.objects.values_list('key', flat=True)),
+            {live['refresh'], new['refresh']}
+        )
+
+    def test_password_change_revokes_tokens(self):
+        """Test changing the password revokes access and refresh tokens."""
+        tokens = self._login()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {tokens["access"]}'
+        )
+        res = self.client.patch(ME_URL, {'password': 'newpassword123'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.client.credentials()
+        res = self.client.post(REFRESH_URL, {'refresh': tokens['refresh']})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ConcurrentRefreshTests(TransactionTestCase):
+    """Test a refresh token is exchanged once under concurrency."""
+
+    def setUp(self):
+        user_cache.clear()
+        get_user_model().objects.create_user(
+            email='race@example.com',
+            password='simple123'
+        )
+
+    def _refresh(self, barrier, refresh, statuses):
+        client = APIClient()
+        try:
+            barrier.wait()
+            res = client.post(REFRESH_URL, {'refresh': refresh})
+            statuses.append(res.status_code)
+        finally:
+            connection.close()
+
+    def test_concurrent_refresh_single_use(self):
+        """Test only one concurrent refresh of a token succeeds."""
+        res = APIClient().post(TOKEN_URL, {
+            'email': 'race@example.com',
+            'password': 'simple123',
+            'token_type': 'signed',
+        })
+        workers = 4
+        barrier = threading.Barrier(workers)
+        statuses = []
+        threads = [
+            threading.Thread(
+                target=self._refresh,
+                args=(barrier, res.data['refresh'], statuses)
+            )
+            for _ in range(workers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(statuses), [status.HTTP_200_OK] + [
+            status.HTTP_400_BAD_REQUEST
+        ] * (workers - 1))
@@ -0,0 +1,68 @@
+"""
+Signed access tokens and database refresh tokens.
+"""
+import secrets
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.utils import timezone
+
+from core.models import RefreshToken
+
+ACCESS_TOKEN_SALT = 'user.tokens.access'
+
+
+def create_access_token(user):
+    """Return an HMAC-signed, timestamped token carrying the user id."""
+    return signing.dumps(
+        {'uid': user.pk, 'gen': user.token_generation},
+        salt=ACCESS_TOKEN_SALT
+    )
+
+
+def read_access_token(token):
+    """Return the payload of an access token without database access.
+
+    Raises signing.BadSignature if the token is forged or expired.
+    """
+    return signing.loads(
+        token,
+        salt=ACCESS_TOKEN_SALT,
+        max_age=settings.ACCESS_TOKEN_LIFETIME
+    )
+
+
+def create_refresh_token(user):
+    """Store and return a new refresh token for the user.
+
+    The user's expired refresh tokens are deleted first.
+    """
+    now = timezone.now()
+    RefreshToken.objects.filter(user=user, expires__lte=now).delete()
+    return RefreshToken.objects.create(
+        key=secrets.token_hex(32),
+        user=user,
+        generation=user.token_generation,
+        expires=now + timedelta(
+            seconds=settings.REFRESH_TOKEN_LIFETIME
+        )
+    )
+
+
+def issue_tokens(user):
+    """Return an access and refresh token pair for the user."""
+    return {
+        'access': create_access_token(user),
+        'refresh': create_refresh_token(user).key,
+        'expires_in': settings.ACCESS_TOKEN_LIFETIME,
+    }
+
+
+def revoke_tokens(user):
+    """Invalidate every signed and refresh token issued to the user.
+
+    The caller saves the user to persist the new token generation.
+    """
+    user.token_generation += 1
+    RefreshToken.objects.filter(user=user).delete()
@@ -2,13 +2,22 @@
 Views for the user API.
 """
 
-from rest_framework import generics, authentication, permissions
+from django.db import transaction
+from rest_framework import generics, permissions
+from rest_framework.authtoken.models import Token
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
+from user.authentication import (
+    CachedTokenAuthentication,
+    SignedTokenAuthentication
+)
 from user.serializers import (
     UserSerializer,
-    AuthTokenSerializer
+    AuthTokenSerializer,
+    RefreshTokenSerializer
 )
+from user.tokens import issue_tokens
 
 class CreateUserView(generics.CreateAPIView):
     """Create a new user in the system"""
@@ -18,11 +27,40 @@ class CreateTokenView(ObtainAuthToken):
     """Create a new auth token for user."""
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    parser_classes = api_settings.DEFAULT_PARSER_CLASSES
+
+    def post(self, request, *args, **kwargs):
+        """Issue a database token, or signed tokens if requested."""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user = serializer.validated_data['user']
+
+        if serializer.validated_data['token_type'] == 'signed':
+            return Response(issue_tokens(user))
+
+        token, created = Token.objects.get_or_create(user=user)
+        return Response({'token': token.key})
+
+class RefreshTokenView(generics.GenericAPIView):
+    """Exchange a refresh token for a new access and refresh token."""
+    serializer_class = RefreshTokenSerializer
+
+    @transaction.atomic
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        token = serializer.validated_data['token']
+        token.delete()
+
+        return Response(issue_tokens(token.user))
 
 class ManageUserView(generics.RetrieveUpdateAPIView):
     """Manage and authenticated user."""
     serializer_class = UserSerializer
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [
+        CachedTokenAuthentication,
+        SignedTokenAuthentication
+    ]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):